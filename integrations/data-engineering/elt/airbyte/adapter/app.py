@@ -8,6 +8,21 @@ Environment variables:
   - QALITA_BASE_URL: e.g. http://localhost:8000
   - QALITA_USERNAME / QALITA_PASSWORD: service account credentials
   - ADAPTER_CONFIG_PATH: path to JSON config mapping connectionId→QALITA ids (default: /config/config.json)
+  - ADAPTER_CONFIG_CHECK_INTERVAL: seconds between config file change checks (default: 1)
+  - QALITA_HTTP_MAX_CONNECTIONS: max pooled connections to QALITA (default: 100)
+  - QALITA_HTTP_MAX_KEEPALIVE: max idle keep-alive connections kept in the pool (default: 20)
+  - QALITA_HTTP_KEEPALIVE_EXPIRY: seconds an idle connection is kept open (default: 30)
+  - QALITA_HTTP2: "auto" (default, enabled when `h2` is installed), "true" or "false"
+  - QALITA_TOKEN_TTL_SECONDS: token lifetime when QALITA does not advertise one (default: 3600)
+  - QALITA_MAX_IN_FLIGHT: max concurrent requests to QALITA per adapter process (default: 16)
+  - ADAPTER_QUEUE_*: durable ingest queue settings, see ingest_queue.py
+  - ADAPTER_SCHEMA_*: schema fingerprint cache settings, see schema_cache.py
+
+Events are persisted to the local ingest queue and acknowledged with 202;
+background workers forward them to QALITA.
+
+The config file is parsed once and reloaded when its mtime/inode changes,
+or immediately on SIGHUP.
 
 Run:
   uvicorn app:app --host 0.0.0.0 --port 8080
@@ -15,17 +30,39 @@ Run:
 
 from __future__ import annotations
 
+import asyncio
+import base64
+import importlib.util
+import logging
 import os
 import json
-from typing import Any, Dict, Optional, List
+import signal
+import threading
+import time
+from contextlib import asynccontextmanager
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Mapping, Optional, List, Sequence, Set, Tuple
 from datetime import datetime
 
 import httpx
 from fastapi import FastAPI, Request, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+import qalita_json
+from ingest_queue import IngestQueue, IngestWorkerPool, QueueSettings
+from schema_cache import SchemaFingerprintCache, SchemaPlan, schema_cache_key
+from streaming import has_schemas, iter_merged_schemas, multipart_json_array, new_boundary, parse_event_header
+
+
+logger = logging.getLogger("qalita_airbyte_adapter")
+
+# Refresh the token slightly before it actually expires to avoid in-flight 401s
+TOKEN_EXPIRY_SKEW_SECONDS = 30.0
 
 
 class QalitaIds(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     source_id: int
     source_version_id: int
     pack_id: int
@@ -33,53 +70,199 @@ class QalitaIds(BaseModel):
 
 
 class AdapterConfig(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     # Map Airbyte connectionId to QALITA identifiers
-    connection_map: Dict[str, QalitaIds] = {}
+    connection_map: Mapping[str, QalitaIds] = Field(default_factory=dict, validate_default=True)
     # Optional defaults if no mapping found
     default: Optional[QalitaIds] = None
 
+    @field_validator("connection_map", mode="after")
+    @classmethod
+    def _freeze_connection_map(cls, value: Mapping[str, QalitaIds]) -> Mapping[str, QalitaIds]:
+        # Shared by every request; make it read-only
+        return MappingProxyType(dict(value))
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _http2_enabled() -> bool:
+    flag = os.getenv("QALITA_HTTP2", "auto").strip().lower()
+    if flag in ("0", "false", "no", "off"):
+        return False
+    available = importlib.util.find_spec("h2") is not None
+    if flag in ("1", "true", "yes", "on") and not available:
+        raise RuntimeError("QALITA_HTTP2 is enabled but the `h2` package is not installed (pip install 'httpx[http2]')")
+    return available
+
+
+def build_http_client() -> httpx.AsyncClient:
+    """Create the process-wide HTTP client holding the connection pool to QALITA."""
+    limits = httpx.Limits(
+        max_connections=_env_int("QALITA_HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=_env_int("QALITA_HTTP_MAX_KEEPALIVE", 20),
+        keepalive_expiry=_env_float("QALITA_HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+    return httpx.AsyncClient(limits=limits, http2=_http2_enabled(), timeout=60.0)
+
+
+def _token_expiry(payload: Dict[str, Any], token: str, now: float) -> float:
+    # Prefer an explicit lifetime from the signin response
+    expires_in = payload.get("expires_in")
+    if isinstance(expires_in, (int, float)) and expires_in > 0:
+        return now + float(expires_in)
+    # Otherwise read the (unverified) `exp` claim when the token is a JWT
+    parts = token.split(".")
+    if len(parts) == 3:
+        try:
+            claims_b64 = parts[1] + "=" * (-len(parts[1]) % 4)
+            claims = json.loads(base64.urlsafe_b64decode(claims_b64))
+            exp = claims.get("exp")
+            if isinstance(exp, (int, float)):
+                return float(exp)
+        except Exception:
+            pass
+    return now + _env_float("QALITA_TOKEN_TTL_SECONDS", 3600.0)
+
 
 class QalitaClient:
-    def __init__(self, base_url: str, username: str, password: str) -> None:
+    """QALITA API client sharing one connection pool and one bearer token per process."""
+
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        http: httpx.AsyncClient,
+        max_in_flight: int = 16,
+    ) -> None:
         self.base_url = base_url.rstrip("/")
         self.username = username
         self.password = password
+        self.http = http
+        self.max_in_flight = max(1, max_in_flight)
         self._token: Optional[str] = None
-
-    async def _ensure_token(self, client: httpx.AsyncClient) -> None:
-        if self._token is not None:
-            return
-        data = {
-            "username": self.username,
-            "password": self.password,
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+        # Caps in-flight QALITA requests across every worker of this process
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._in_flight_count = 0
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "signins": 0,
+            "token_cache_hits": 0,
+            "token_refreshes_on_401": 0,
         }
-        resp = await client.post(
-            f"{self.base_url}/api/v1/auth/signin",
-            data=data,
-            timeout=30.0,
-        )
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=f"Failed to sign in to QALITA: {resp.text}")
-        payload = resp.json()
-        self._token = payload.get("access_token")
-        if not self._token:
-            raise HTTPException(status_code=500, detail="No access_token returned by QALITA")
 
-    def _auth_headers(self) -> Dict[str, str]:
-        if not self._token:
-            raise RuntimeError("Token not initialized")
-        return {"Authorization": f"Bearer {self._token}"}
+    def _token_valid(self) -> bool:
+        return self._token is not None and time.time() < self._token_expires_at - TOKEN_EXPIRY_SKEW_SECONDS
+
+    async def _ensure_token(self) -> str:
+        if self._token_valid():
+            self.stats["token_cache_hits"] += 1
+            return self._token  # type: ignore[return-value]
+        # Only one coroutine signs in; the others wait and reuse its token
+        async with self._token_lock:
+            if self._token_valid():
+                self.stats["token_cache_hits"] += 1
+                return self._token  # type: ignore[return-value]
+            data = {
+                "username": self.username,
+                "password": self.password,
+            }
+            resp = await self.http.post(
+                f"{self.base_url}/api/v1/auth/signin",
+                data=data,
+                timeout=30.0,
+            )
+            self.stats["signins"] += 1
+            if resp.status_code != 200:
+                raise HTTPException(status_code=resp.status_code, detail=f"Failed to sign in to QALITA: {resp.text}")
+            payload = resp.json()
+            token = payload.get("access_token")
+            if not token:
+                raise HTTPException(status_code=500, detail="No access_token returned by QALITA")
+            self._token = token
+            self._token_expires_at = _token_expiry(payload, token, time.time())
+            return token
+
+    def _invalidate_token(self, token: str) -> None:
+        # Do not drop a token another coroutine has already refreshed
+        if self._token == token:
+            self._token = None
+            self._token_expires_at = 0.0
+
+    async def _post(
+        self,
+        path: str,
+        headers: Optional[Dict[str, str]] = None,
+        stream: Optional[Callable[[], AsyncIterator[bytes]]] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """POST with the cached bearer token, signing in again once on a 401.
+
+        `stream` builds a fresh streamed body for each attempt, since a
+        consumed async iterator cannot be sent twice.
+        """
+        for attempt in range(2):
+            if stream is not None:
+                kwargs["content"] = stream()
+            token = await self._ensure_token()
+            self.stats["requests"] += 1
+            async with self._in_flight:
+                self._in_flight_count += 1
+                try:
+                    resp = await self.http.post(
+                        f"{self.base_url}{path}",
+                        headers={**(headers or {}), "Authorization": f"Bearer {token}"},
+                        **kwargs,
+                    )
+                finally:
+                    self._in_flight_count -= 1
+            if resp.status_code != 401 or attempt == 1:
+                return resp
+            self.stats["token_refreshes_on_401"] += 1
+            self._invalidate_token(token)
+        return resp
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of token cache and connection pool state."""
+        pool: Dict[str, Any] = {"http2": _http2_enabled()}
+        # httpx does not expose pool state publicly; read it best-effort from httpcore
+        connections = getattr(getattr(self.http, "_transport", None), "_pool", None)
+        connections = getattr(connections, "connections", None)
+        if connections is not None:
+            pool["connections"] = len(connections)
+            pool["idle_connections"] = sum(1 for c in connections if c.is_idle())
+        return {
+            **self.stats,
+            "in_flight": self._in_flight_count,
+            "max_in_flight": self.max_in_flight,
+            "token_cached": self._token_valid(),
+            "token_expires_in_seconds": max(0.0, round(self._token_expires_at - time.time(), 1)),
+            "pool": pool,
+        }
 
     async def upload_metrics(
         self,
-        client: httpx.AsyncClient,
         ids: QalitaIds,
-        metrics: List[Dict[str, Any]],
+        metrics: List[qalita_json.Metric],
     ) -> None:
-        await self._ensure_token(client)
         files = {
             # Send metrics as a JSON array file
-            "file": ("metrics.json", json.dumps(metrics), "application/json"),
+            "file": ("metrics.json", qalita_json.dumps(metrics), "application/json"),
         }
         data = {
             "source_id": str(ids.source_id),
@@ -87,9 +270,8 @@ class QalitaClient:
             "pack_id": str(ids.pack_id),
             "pack_version_id": str(ids.pack_version_id),
         }
-        resp = await client.post(
-            f"{self.base_url}/api/v1/metrics/upload",
-            headers=self._auth_headers(),
+        resp = await self._post(
+            "/api/v1/metrics/upload",
             files=files,
             data=data,
             timeout=60.0,
@@ -99,25 +281,25 @@ class QalitaClient:
 
     async def upload_schemas(
         self,
-        client: httpx.AsyncClient,
         ids: QalitaIds,
-        schemas: List[Dict[str, Any]],
+        schemas: Callable[[], Iterable[qalita_json.SchemaRecord]],
     ) -> None:
-        await self._ensure_token(client)
-        files = {
-            "file": ("schemas.json", json.dumps(schemas), "application/json"),
-        }
+        """Upload schema rows as a chunked multipart body.
+
+        `schemas` returns a fresh iterable of rows; they are serialized while
+        the request is being sent and never collected into a list.
+        """
         data = {
             "source_id": str(ids.source_id),
             "source_version_id": str(ids.source_version_id),
             "pack_id": str(ids.pack_id),
             "pack_version_id": str(ids.pack_version_id),
         }
-        resp = await client.post(
-            f"{self.base_url}/api/v1/schemas/upload",
-            headers=self._auth_headers(),
-            files=files,
-            data=data,
+        boundary = new_boundary()
+        resp = await self._post(
+            "/api/v1/schemas/upload",
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            stream=lambda: multipart_json_array(data, "schemas.json", schemas(), boundary),
             timeout=60.0,
         )
         if resp.status_code != 200:
@@ -125,14 +307,12 @@ class QalitaClient:
 
     async def create_or_update_job(
         self,
-        client: httpx.AsyncClient,
         ids: QalitaIds,
         name: Optional[str],
         status: Optional[str],
         start_dt: Optional[datetime],
         end_dt: Optional[datetime],
     ) -> None:
-        await self._ensure_token(client)
         # Create a Job row for observability purposes
         payload: Dict[str, Any] = {
             "source_id": ids.source_id,
@@ -147,10 +327,10 @@ class QalitaClient:
         if end_dt:
             payload["end_date"] = end_dt.isoformat()
 
-        resp = await client.post(
-            f"{self.base_url}/api/v2/jobs",
-            headers={**self._auth_headers(), "Content-Type": "application/json"},
-            content=json.dumps(payload),
+        resp = await self._post(
+            "/api/v2/jobs",
+            headers={"Content-Type": "application/json"},
+            content=qalita_json.dumps(payload),
             timeout=30.0,
         )
         # Accept 200/201
@@ -158,8 +338,12 @@ class QalitaClient:
             raise HTTPException(status_code=resp.status_code, detail=f"Job create failed: {resp.text}")
 
 
-def load_config() -> AdapterConfig:
-    path = os.getenv("ADAPTER_CONFIG_PATH", "/config/config.json")
+def config_path() -> str:
+    return os.getenv("ADAPTER_CONFIG_PATH", "/config/config.json")
+
+
+def load_config(path: Optional[str] = None) -> AdapterConfig:
+    path = path or config_path()
     if not os.path.exists(path):
         # Allow running without config for quick tests
         return AdapterConfig()
@@ -171,23 +355,89 @@ def load_config() -> AdapterConfig:
     return AdapterConfig(connection_map=conn_map, default=default)
 
 
+class ConfigCache:
+    """Parsed adapter config, reloaded only when the file changes.
+
+    `get()` returns the current immutable snapshot without locking; at most
+    once per `check_interval` seconds it stats the file and swaps in a new
+    snapshot when the inode, mtime or size changed. A failed reload keeps the
+    previous snapshot.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.reload_errors = 0
+        self._reload_lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._next_check = 0.0
+        self._config = AdapterConfig()
+        self.reload(force=True)
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def get(self) -> AdapterConfig:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self.reload()
+        return self._config
+
+    def reload(self, force: bool = False) -> None:
+        signature = self._file_signature()
+        if not force and signature == self._signature:
+            return
+        # Another caller is already reloading; keep serving the current snapshot
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            try:
+                config = load_config(self.path)
+            except Exception:
+                self.reload_errors += 1
+                # Do not retry the same broken file on every check; wait for the next change
+                self._signature = signature
+                logger.exception("Failed to reload adapter config from %s; keeping previous config", self.path)
+                return
+            self._config = config
+            self._signature = signature
+            self.reloads += 1
+            logger.info("Loaded adapter config from %s (%d connections)", self.path, len(config.connection_map))
+        finally:
+            self._reload_lock.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self._config.connection_map),
+            "has_default": self._config.default is not None,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
+
+
 def pick_ids(cfg: AdapterConfig, connection_id: Optional[str]) -> QalitaIds:
     if connection_id and connection_id in cfg.connection_map:
-        return QalitaIds(**cfg.connection_map[connection_id])
+        return cfg.connection_map[connection_id]
     if cfg.default is not None:
-        return QalitaIds(**cfg.default)
+        return cfg.default
     raise HTTPException(status_code=400, detail="No QALITA id mapping found for connection and no default provided")
 
 
-def extract_metrics_from_airbyte(event: Dict[str, Any]) -> List[Dict[str, Any]]:
-    metrics: List[Dict[str, Any]] = []
+def extract_metrics_from_airbyte(event: Dict[str, Any]) -> List[qalita_json.Metric]:
+    metrics: List[qalita_json.Metric] = []
     # Best-effort extraction across Airbyte OSS/Cloud payloads
     job = event.get("job", {})
     attempt = event.get("attempt", {})
     stats = attempt.get("totalStats", {}) or attempt.get("syncStats", {}) or {}
 
     def add_metric(key: str, value: Any, scope: Optional[Dict[str, Any]] = None) -> None:
-        metrics.append({"key": key, "value": str(value), "scope": scope or {}})
+        metrics.append(qalita_json.Metric(key=key, value=str(value), scope=scope or {}))
 
     # Row counts
     if "recordsEmitted" in stats:
@@ -210,28 +460,6 @@ def extract_metrics_from_airbyte(event: Dict[str, Any]) -> List[Dict[str, Any]]:
     return metrics
 
 
-def extract_schemas_from_airbyte(event: Dict[str, Any]) -> List[Dict[str, Any]]:
-    schemas: List[Dict[str, Any]] = []
-    # Attempt to parse catalog/streams if provided
-    catalog = event.get("catalog") or event.get("syncedCatalog") or {}
-    streams = catalog.get("streams", [])
-    for stream in streams:
-        stream_name = stream.get("stream", {}).get("name") or stream.get("name")
-        json_schema = stream.get("stream", {}).get("jsonSchema") or stream.get("jsonSchema") or {}
-        properties = json_schema.get("properties", {})
-        for col_name, col_schema in properties.items():
-            dtype = col_schema.get("type")
-            # Store one line per column
-            schemas.append(
-                {
-                    "key": f"{stream_name}.{col_name}",
-                    "value": str(dtype),
-                    "scope": {"stream": stream_name, "column": col_name},
-                }
-            )
-    return schemas
-
-
 def parse_dt(ms: Optional[int]) -> Optional[datetime]:
     if ms is None:
         return None
@@ -242,57 +470,239 @@ def parse_dt(ms: Optional[int]) -> Optional[datetime]:
         return None
 
 
-app = FastAPI(title="QALITA Airbyte Adapter")
-
-
-@app.post("/airbyte/webhook")
-async def airbyte_webhook(req: Request) -> Dict[str, Any]:
-    try:
-        body = await req.json()
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
-
-    # Identify connection id
-    connection_id = (
-        body.get("connection", {}).get("connectionId")
-        or body.get("connectionId")
-        or body.get("connection_id")
-    )
-
-    cfg = load_config()
-    ids = pick_ids(cfg, str(connection_id) if connection_id is not None else None)
-
-    qalita = QalitaClient(
-        base_url=os.getenv("QALITA_BASE_URL", "http://localhost:8000"),
-        username=os.getenv("QALITA_USERNAME", "admin"),
-        password=os.getenv("QALITA_PASSWORD", "admin"),
-    )
-
-    async with httpx.AsyncClient() as client:
-        # 1) Upload schemas (if any)
-        schemas = extract_schemas_from_airbyte(body)
-        if schemas:
-            await qalita.upload_schemas(client, ids, schemas)
-
-        # 2) Upload metrics
-        metrics = extract_metrics_from_airbyte(body)
-        if metrics:
-            await qalita.upload_metrics(client, ids, metrics)
-
-        # 3) Create job record for the run
+# Calls made for each forwarded event; recorded per event so a retry skips those already made
+SCHEMAS_CALL = "upload_schemas"
+METRICS_CALL = "upload_metrics"
+JOB_CALL = "create_or_update_job"
+
+
+class ForwardError(Exception):
+    """One or more QALITA calls failed while forwarding a batch of events.
+
+    `completed` lists, for each event, the calls made for it so far (this
+    attempt and earlier ones); pass it back as `done` when retrying.
+    """
+
+    def __init__(self, failures: Dict[str, str], succeeded: List[str], completed: List[List[str]]) -> None:
+        self.failures = failures
+        self.succeeded = succeeded
+        self.completed = completed
+        self.detail = "; ".join(f"{call}: {error}" for call, error in failures.items())
+        super().__init__(self.detail)
+
+
+def _describe_error(exc: BaseException) -> str:
+    if isinstance(exc, HTTPException):
+        return f"{exc.status_code} {exc.detail}"
+    return str(exc) or type(exc).__name__
+
+
+def _plan_schemas(
+    schema_cache: SchemaFingerprintCache, by_connection: Dict[str, List[bytes]]
+) -> List[Tuple[SchemaPlan, List[bytes]]]:
+    return [(schema_cache.plan(key, iter_merged_schemas(raws)), raws) for key, raws in by_connection.items()]
+
+
+async def upload_schemas_and_commit(
+    qalita: QalitaClient,
+    schema_cache: SchemaFingerprintCache,
+    ids: QalitaIds,
+    plans: List[Tuple[SchemaPlan, List[bytes]]],
+) -> None:
+    def rows() -> Iterable[qalita_json.SchemaRecord]:
+        # Connections mapped to the same ids may share keys; send each key once
+        seen: Optional[Set[str]] = set() if len(plans) > 1 else None
+        for plan, raws in plans:
+            for row in iter_merged_schemas(raws):
+                # Diff mode: only columns added or changed since the last upload
+                if plan.changed_keys is not None and row.key not in plan.changed_keys:
+                    continue
+                if seen is not None:
+                    if row.key in seen:
+                        continue
+                    seen.add(row.key)
+                yield row
+
+    await qalita.upload_schemas(ids, rows)
+    # Only remember the fingerprints once QALITA has the schema
+    for plan, _ in plans:
+        await asyncio.to_thread(schema_cache.commit, plan)
+
+
+async def forward_events(
+    qalita: QalitaClient,
+    group_key: str,
+    raw_events: List[bytes],
+    schema_cache: Optional[SchemaFingerprintCache] = None,
+    done: Optional[Sequence[Iterable[str]]] = None,
+) -> None:
+    """Forward queued Airbyte events that map to the same QALITA identifiers.
+
+    Schemas and metrics of all events are sent in one upload each; a job row
+    is still created per Airbyte event. The schema of each Airbyte connection
+    is skipped when its fingerprint did not change since the last upload
+    for that connection and these ids. The calls are
+    independent and run concurrently, bounded by the client's in-flight
+    limit. Raises `ForwardError` listing each failed call when any of them fails.
+
+    `done` lists, per event, the calls an earlier attempt already made for
+    it (`ForwardError.completed`): they are not made again, so a retry
+    neither re-creates job rows nor re-uploads metrics.
+    """
+    ids = QalitaIds.model_validate_json(group_key)
+    events = [parse_event_header(raw) for raw in raw_events]
+    done_calls: List[Set[str]] = [set(d) for d in done] if done is not None else [set() for _ in events]
+    calls: Dict[str, Awaitable[None]] = {}
+    # Per-event call name and the events each call is made for
+    covers: Dict[str, Tuple[str, List[int]]] = {}
+
+    def pending(call: str) -> List[int]:
+        return [n for n in range(len(events)) if call not in done_calls[n]]
+
+    # 1) Upload schemas (if any and changed), streamed from the raw catalogs
+    schema_events = pending(SCHEMAS_CALL)
+    schema_raws = [raw_events[n] for n in schema_events]
+    if schema_raws and has_schemas(schema_raws):
+        if schema_cache is None:
+            calls["upload_schemas"] = qalita.upload_schemas(ids, lambda: iter_merged_schemas(schema_raws))
+        else:
+            # Fingerprints are tracked per connection: several connections may map to the same ids
+            by_connection: Dict[str, List[bytes]] = {}
+            for n in schema_events:
+                connection_id = get_connection_id(events[n])
+                key = schema_cache_key(str(connection_id) if connection_id is not None else None, group_key)
+                by_connection.setdefault(key, []).append(raw_events[n])
+            # Hashing walks the whole catalogs; keep it off the event loop
+            plans = await asyncio.to_thread(_plan_schemas, schema_cache, by_connection)
+            changed = [(plan, raws) for plan, raws in plans if not plan.unchanged]
+            to_upload = [(plan, raws) for plan, raws in changed if plan.changed_keys != set()]
+            if to_upload:
+                calls["upload_schemas"] = upload_schemas_and_commit(qalita, schema_cache, ids, to_upload)
+            for plan, _ in changed:
+                if plan.changed_keys == set():
+                    # Only columns were removed; nothing to send but the new state is known
+                    await asyncio.to_thread(schema_cache.commit, plan)
+        covers["upload_schemas"] = (SCHEMAS_CALL, schema_events)
+
+    # 2) Upload metrics
+    metric_events = pending(METRICS_CALL)
+    metrics = [m for n in metric_events for m in extract_metrics_from_airbyte(events[n])]
+    if metrics:
+        calls["upload_metrics"] = qalita.upload_metrics(ids, metrics)
+        covers["upload_metrics"] = (METRICS_CALL, metric_events)
+
+    # 3) Create job record for each run
+    for n in pending(JOB_CALL):
+        body = events[n]
         job = body.get("job", {})
         attempt = body.get("attempt", {})
         status = job.get("status") or attempt.get("status")
-        name = job.get("name") or f"Airbyte connection {connection_id}"
+        name = job.get("name") or f"Airbyte connection {get_connection_id(body)}"
         start_dt = parse_dt(attempt.get("startedAt") or job.get("startedAt"))
         end_dt = parse_dt(attempt.get("endedAt") or job.get("endedAt"))
-        await qalita.create_or_update_job(
-            client,
+        calls[f"create_or_update_job[{n}]"] = qalita.create_or_update_job(
             ids,
             name=name,
             status=status,
             start_dt=start_dt,
             end_dt=end_dt,
         )
+        covers[f"create_or_update_job[{n}]"] = (JOB_CALL, [n])
+
+    # gather (not TaskGroup) so one failing call does not cancel the others
+    results = await asyncio.gather(*calls.values(), return_exceptions=True)
+    failures: Dict[str, str] = {}
+    succeeded: List[str] = []
+    for call, result in zip(calls, results):
+        if isinstance(result, BaseException):
+            failures[call] = _describe_error(result)
+        else:
+            succeeded.append(call)
+    if failures:
+        completed = [set(d) for d in done_calls]
+        for call in succeeded:
+            name, covered = covers[call]
+            for n in covered:
+                completed[n].add(name)
+        raise ForwardError(failures, succeeded, [sorted(c) for c in completed])
+
+
+def get_connection_id(body: Dict[str, Any]) -> Optional[Any]:
+    return (
+        body.get("connection", {}).get("connectionId")
+        or body.get("connectionId")
+        or body.get("connection_id")
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # One pooled client and one token cache for the whole process lifetime
+    async with build_http_client() as http:
+        qalita = QalitaClient(
+            base_url=os.getenv("QALITA_BASE_URL", "http://localhost:8000"),
+            username=os.getenv("QALITA_USERNAME", "admin"),
+            password=os.getenv("QALITA_PASSWORD", "admin"),
+            http=http,
+            max_in_flight=_env_int("QALITA_MAX_IN_FLIGHT", 16),
+        )
+        config = ConfigCache(config_path(), check_interval=_env_float("ADAPTER_CONFIG_CHECK_INTERVAL", 1.0))
+        settings = QueueSettings.from_env()
+        queue = IngestQueue(settings.path)
+        schema_cache = SchemaFingerprintCache.from_env()
+
+        async def forward(group_key: str, raw_events: List[bytes], done: List[List[str]]) -> None:
+            await forward_events(qalita, group_key, raw_events, schema_cache=schema_cache, done=done)
+
+        workers = IngestWorkerPool(queue, forward, settings)
+        app.state.config = config
+        app.state.qalita = qalita
+        app.state.ingest = workers
+        app.state.schema_cache = schema_cache
+        workers.start()
+        loop = asyncio.get_running_loop()
+        try:
+            # `kill -HUP` forces a reload without waiting for the next file check
+            loop.add_signal_handler(signal.SIGHUP, lambda: config.reload(force=True))
+        except (AttributeError, NotImplementedError, RuntimeError):
+            pass
+        try:
+            yield
+        finally:
+            await workers.stop()
+            queue.close()
+            schema_cache.close()
+
+
+app = FastAPI(title="QALITA Airbyte Adapter", lifespan=lifespan)
+
+
+@app.get("/metrics")
+async def adapter_metrics(req: Request) -> Dict[str, Any]:
+    ingest_metrics = await asyncio.to_thread(req.app.state.ingest.metrics)
+    return {
+        "qalita_client": req.app.state.qalita.metrics(),
+        "ingest_queue": ingest_metrics,
+        "config": req.app.state.config.metrics(),
+        "schema_cache": req.app.state.schema_cache.metrics(),
+    }
+
+
+@app.post("/airbyte/webhook", status_code=202)
+async def airbyte_webhook(req: Request) -> Dict[str, Any]:
+    raw = await req.body()
+    try:
+        # The catalog is not materialized here; workers stream it from the raw body
+        body = parse_event_header(raw)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+
+    # Identify connection id
+    connection_id = get_connection_id(body)
+
+    # Resolve the mapping now so unmapped connections are still rejected synchronously
+    cfg = req.app.state.config.get()
+    ids = pick_ids(cfg, str(connection_id) if connection_id is not None else None)
 
-    return {"ok": True}
+    event_id = await req.app.state.ingest.put(ids.model_dump_json(), raw)
+    return {"ok": True, "queued": True, "event_id": event_id}
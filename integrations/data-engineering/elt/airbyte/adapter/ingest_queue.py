@@ -0,0 +1,329 @@
+"""
+Durable ingest queue for the Airbyte → QALITA adapter
+
+Webhook events are appended to a local SQLite database (WAL mode) and drained
+by a pool of background workers. Events sharing the same QALITA identifiers
+are forwarded together so their metrics go out in a single upload.
+
+Delivery is at-least-once: a batch that fails is retried with exponential
+backoff, and events that exhaust their attempts are moved to `dead_letters`.
+When only some of an event's calls failed, the calls that succeeded are
+recorded on its row (`done_calls`) and skipped by the retry.
+
+Environment variables:
+  - ADAPTER_QUEUE_PATH: SQLite file used as the queue (default: ./adapter_queue.sqlite3)
+  - ADAPTER_QUEUE_WORKERS: number of background workers (default: 4)
+  - ADAPTER_QUEUE_BATCH_SIZE: max events claimed by a worker at once (default: 200)
+  - ADAPTER_QUEUE_MAX_ATTEMPTS: attempts before an event is dead-lettered (default: 8)
+  - ADAPTER_QUEUE_BACKOFF_BASE / ADAPTER_QUEUE_BACKOFF_MAX: retry backoff bounds in seconds (default: 2 / 300)
+  - ADAPTER_QUEUE_POLL_INTERVAL: idle worker poll interval in seconds (default: 0.5)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+logger = logging.getLogger("qalita_airbyte_adapter.queue")
+
+# A claimed batch is handed back to other workers if not acked within this delay
+LEASE_SECONDS = 300.0
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+@dataclass
+class QueueSettings:
+    path: str = "adapter_queue.sqlite3"
+    workers: int = 4
+    batch_size: int = 200
+    max_attempts: int = 8
+    backoff_base: float = 2.0
+    backoff_max: float = 300.0
+    poll_interval: float = 0.5
+
+    @classmethod
+    def from_env(cls) -> "QueueSettings":
+        return cls(
+            path=os.getenv("ADAPTER_QUEUE_PATH", cls.path),
+            workers=max(1, _env_int("ADAPTER_QUEUE_WORKERS", cls.workers)),
+            batch_size=max(1, _env_int("ADAPTER_QUEUE_BATCH_SIZE", cls.batch_size)),
+            max_attempts=max(1, _env_int("ADAPTER_QUEUE_MAX_ATTEMPTS", cls.max_attempts)),
+            backoff_base=_env_float("ADAPTER_QUEUE_BACKOFF_BASE", cls.backoff_base),
+            backoff_max=_env_float("ADAPTER_QUEUE_BACKOFF_MAX", cls.backoff_max),
+            poll_interval=_env_float("ADAPTER_QUEUE_POLL_INTERVAL", cls.poll_interval),
+        )
+
+
+@dataclass
+class QueuedEvent:
+    id: int
+    group_key: str
+    payload: bytes
+    attempts: int
+    # Calls already made for this event by earlier attempts
+    done: List[str] = field(default_factory=list)
+
+
+def _encode_done(calls: List[str]) -> str:
+    return ",".join(sorted(set(calls)))
+
+
+def _decode_done(value: Optional[str]) -> List[str]:
+    return [call for call in (value or "").split(",") if call]
+
+
+class IngestQueue:
+    """SQLite-backed event queue.
+
+    Methods are blocking; call them through `asyncio.to_thread` from async code.
+    """
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.execute("pragma journal_mode=wal")
+        # WAL + NORMAL keeps committed events across process crashes without an fsync per insert
+        self._conn.execute("pragma synchronous=normal")
+        self._conn.executescript(
+            """
+            create table if not exists events (
+                id integer primary key autoincrement,
+                group_key text not null,
+                payload blob not null,
+                attempts integer not null default 0,
+                done_calls text not null default '',
+                next_attempt_at real not null,
+                lease_until real,
+                last_error text,
+                created_at real not null
+            );
+            create index if not exists ix_events_ready on events (next_attempt_at);
+
+            create table if not exists dead_letters (
+                id integer primary key,
+                group_key text not null,
+                payload blob not null,
+                attempts integer not null,
+                done_calls text not null default '',
+                last_error text,
+                created_at real not null,
+                failed_at real not null
+            );
+            """
+        )
+        # Queue files created before done_calls existed
+        for table in ("events", "dead_letters"):
+            columns = {row[1] for row in self._conn.execute(f"pragma table_info({table})")}
+            if "done_calls" not in columns:
+                self._conn.execute(f"alter table {table} add column done_calls text not null default ''")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def put(self, group_key: str, payload: bytes) -> int:
+        """Append a raw JSON event body; it is stored as-is, without re-encoding."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "insert into events (group_key, payload, next_attempt_at, created_at) values (?, ?, ?, ?)",
+                (group_key, sqlite3.Binary(payload), now, now),
+            )
+            return int(cur.lastrowid)
+
+    def claim(self, limit: int) -> List[QueuedEvent]:
+        """Lease up to `limit` ready events, oldest first."""
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock so concurrent adapter processes never claim the same rows
+            self._conn.execute("begin immediate")
+            try:
+                rows = self._conn.execute(
+                    """
+                    select id, group_key, payload, attempts, done_calls from events
+                    where next_attempt_at <= ? and (lease_until is null or lease_until < ?)
+                    order by id
+                    limit ?
+                    """,
+                    (now, now, limit),
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "update events set lease_until = ? where id = ?",
+                        [(now + LEASE_SECONDS, row[0]) for row in rows],
+                    )
+                self._conn.execute("commit")
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+        return [
+            QueuedEvent(id=r[0], group_key=r[1], payload=bytes(r[2]), attempts=r[3], done=_decode_done(r[4])) for r in rows
+        ]
+
+    def ack(self, event_ids: List[int]) -> None:
+        with self._lock:
+            self._conn.executemany("delete from events where id = ?", [(i,) for i in event_ids])
+
+    def retry(
+        self,
+        events: List[QueuedEvent],
+        error: str,
+        settings: QueueSettings,
+        completed: Optional[Dict[int, List[str]]] = None,
+    ) -> int:
+        """Reschedule failed events with backoff; dead-letter those out of attempts.
+
+        `completed` maps event ids to the calls made for them so far, stored
+        so that the retry skips them. Returns the number of dead-lettered events.
+        """
+        now = time.time()
+        dead = 0
+        with self._lock:
+            self._conn.execute("begin")
+            try:
+                for event in events:
+                    attempts = event.attempts + 1
+                    done = _encode_done((completed or {}).get(event.id, event.done))
+                    if attempts >= settings.max_attempts:
+                        self._conn.execute(
+                            """
+                            insert into dead_letters (id, group_key, payload, attempts, done_calls, last_error, created_at, failed_at)
+                            select id, group_key, payload, ?, ?, ?, created_at, ? from events where id = ?
+                            """,
+                            (attempts, done, error, now, event.id),
+                        )
+                        self._conn.execute("delete from events where id = ?", (event.id,))
+                        dead += 1
+                        continue
+                    delay = min(settings.backoff_max, settings.backoff_base * (2 ** (attempts - 1)))
+                    # Jitter spreads the retries of a burst that failed together
+                    delay = random.uniform(delay / 2, delay)
+                    self._conn.execute(
+                        """
+                        update events set attempts = ?, done_calls = ?, next_attempt_at = ?, lease_until = null, last_error = ?
+                        where id = ?
+                        """,
+                        (attempts, done, now + delay, error, event.id),
+                    )
+                self._conn.execute("commit")
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+        return dead
+
+    def depth(self) -> Dict[str, int]:
+        with self._lock:
+            pending = self._conn.execute("select count(*) from events").fetchone()[0]
+            dead = self._conn.execute("select count(*) from dead_letters").fetchone()[0]
+        return {"pending": int(pending), "dead_letters": int(dead)}
+
+
+ForwardFn = Callable[[str, List[bytes], List[List[str]]], Awaitable[None]]
+
+
+class IngestWorkerPool:
+    """Background workers draining an `IngestQueue` into a forward callback.
+
+    Claimed events are grouped by `group_key`; `forward` receives the key,
+    the raw bodies of every event in the group, in arrival order, and for
+    each event the calls already made by earlier attempts. When `forward`
+    fails with an exception carrying `completed` (the calls made so far for
+    each event), it is stored so that the retry only repeats the failed calls.
+    """
+
+    def __init__(self, queue: IngestQueue, forward: ForwardFn, settings: QueueSettings) -> None:
+        self.queue = queue
+        self.forward = forward
+        self.settings = settings
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self.stats: Dict[str, int] = {
+            "accepted": 0,
+            "forwarded": 0,
+            "forward_batches": 0,
+            "retried": 0,
+            "dead_lettered": 0,
+        }
+
+    async def put(self, group_key: str, payload: bytes) -> int:
+        event_id = await asyncio.to_thread(self.queue.put, group_key, payload)
+        self.stats["accepted"] += 1
+        self._wakeup.set()
+        return event_id
+
+    def start(self) -> None:
+        for n in range(self.settings.workers):
+            self._tasks.append(asyncio.create_task(self._run(), name=f"ingest-worker-{n}"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        # Cancelled batches keep their lease and are picked up again after restart
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                events = await asyncio.to_thread(self.queue.claim, self.settings.batch_size)
+            except Exception:
+                logger.exception("Failed to claim events from the ingest queue")
+                events = []
+            if not events:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.settings.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            groups: Dict[str, List[QueuedEvent]] = {}
+            for event in events:
+                groups.setdefault(event.group_key, []).append(event)
+            for group_key, group in groups.items():
+                await self._forward_group(group_key, group)
+
+    async def _forward_group(self, group_key: str, group: List[QueuedEvent]) -> None:
+        try:
+            await self.forward(group_key, [e.payload for e in group], [e.done for e in group])
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            error = getattr(exc, "detail", None) or str(exc) or type(exc).__name__
+            logger.warning("Forwarding %d event(s) failed, will retry: %s", len(group), error)
+            completed = getattr(exc, "completed", None)
+            by_id = {e.id: list(calls) for e, calls in zip(group, completed)} if completed is not None else None
+            dead = await asyncio.to_thread(self.queue.retry, group, str(error), self.settings, by_id)
+            self.stats["retried"] += len(group) - dead
+            self.stats["dead_lettered"] += dead
+            return
+        await asyncio.to_thread(self.queue.ack, [e.id for e in group])
+        self.stats["forwarded"] += len(group)
+        self.stats["forward_batches"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, **self.queue.depth(), "workers": len(self._tasks)}
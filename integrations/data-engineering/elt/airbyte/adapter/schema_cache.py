@@ -0,0 +1,207 @@
+"""
+Schema fingerprint cache for the Airbyte → QALITA adapter
+
+Airbyte schemas rarely change between syncs. Before uploading the schema of
+an Airbyte connection, the adapter hashes the normalized schema rows and
+skips the upload when the fingerprint matches the last one that was
+successfully uploaded for that connection. Entries are keyed on the
+connection and its QALITA target (see `schema_cache_key`), so connections
+mapped to the same ids do not overwrite each other's fingerprint, and
+remapping a connection uploads its full schema to the new target.
+
+Fingerprints live in a bounded in-memory LRU backed by a small SQLite file,
+so a restart does not trigger a re-upload of every schema.
+
+Environment variables:
+  - ADAPTER_SCHEMA_CACHE_PATH: SQLite file for fingerprints (default: ./schema_cache.sqlite3, empty = memory only)
+  - ADAPTER_SCHEMA_CACHE_SIZE: max connections kept in memory (default: 10000)
+  - ADAPTER_SCHEMA_DIFF: "true" to upload only added/changed columns once a connection is known (default: false)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional, Set
+
+from qalita_json import SchemaRecord, dumps
+
+
+_MOD = 1 << 128
+
+
+def schema_cache_key(connection_id: Optional[str], group_key: str) -> str:
+    """Cache key of a connection's schema for a QALITA target (`group_key`, the JSON of its ids)."""
+    if connection_id is None:
+        return group_key
+    return f"{connection_id}|{group_key}"
+
+
+def _row_digest(row: SchemaRecord) -> bytes:
+    return hashlib.blake2b(dumps(row, sort_keys=True), digest_size=16).digest()
+
+
+@dataclass
+class SchemaPlan:
+    """Outcome of comparing a batch's schema rows with the cached fingerprint."""
+
+    key: str
+    fingerprint: str
+    unchanged: bool
+    # Per-column digests, only collected in diff mode
+    columns: Optional[Dict[str, str]] = None
+    # Keys to upload in diff mode; None means upload every row
+    changed_keys: Optional[Set[str]] = field(default=None)
+
+
+class SchemaFingerprintCache:
+    def __init__(self, path: Optional[str] = None, max_entries: int = 10000, diff: bool = False) -> None:
+        self.max_entries = max(1, max_entries)
+        self.diff = diff
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"unchanged": 0, "changed": 0, "diff_uploads": 0}
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+            self._conn.execute("pragma journal_mode=wal")
+            self._conn.executescript(
+                """
+                -- group_key holds the cache key (see schema_cache_key)
+                create table if not exists schema_fingerprints (
+                    group_key text primary key,
+                    fingerprint text not null,
+                    updated_at real not null
+                );
+                create table if not exists schema_columns (
+                    group_key text not null,
+                    column_key text not null,
+                    digest text not null,
+                    primary key (group_key, column_key)
+                );
+                """
+            )
+
+    @classmethod
+    def from_env(cls) -> "SchemaFingerprintCache":
+        try:
+            size = int(os.getenv("ADAPTER_SCHEMA_CACHE_SIZE", "10000"))
+        except ValueError:
+            size = 10000
+        return cls(
+            path=os.getenv("ADAPTER_SCHEMA_CACHE_PATH", "schema_cache.sqlite3"),
+            max_entries=size,
+            diff=os.getenv("ADAPTER_SCHEMA_DIFF", "false").strip().lower() in ("1", "true", "yes", "on"),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            fingerprint = self._entries.get(key)
+            if fingerprint is not None:
+                self._entries.move_to_end(key)
+                return fingerprint
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "select fingerprint from schema_fingerprints where group_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._remember(key, row[0])
+            return row[0]
+
+    def _remember(self, key: str, fingerprint: str) -> None:
+        self._entries[key] = fingerprint
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def plan(self, key: str, rows: Iterable[SchemaRecord]) -> SchemaPlan:
+        """Fingerprint `rows` and decide whether (and what) to upload.
+
+        The fingerprint is an order-insensitive sum of per-row hashes, so it
+        is computed in one streaming pass.
+        """
+        total = 0
+        count = 0
+        columns: Optional[Dict[str, str]] = {} if self.diff else None
+        for row in rows:
+            digest = _row_digest(row)
+            total = (total + int.from_bytes(digest, "big")) % _MOD
+            count += 1
+            if columns is not None:
+                columns[row.key] = digest.hex()
+        fingerprint = f"{count}:{total:032x}"
+
+        previous = self._get(key)
+        if previous == fingerprint:
+            self.stats["unchanged"] += 1
+            return SchemaPlan(key, fingerprint, unchanged=True)
+        self.stats["changed"] += 1
+
+        changed_keys: Optional[Set[str]] = None
+        if columns is not None and previous is not None:
+            known = self._columns(key)
+            if known:
+                changed_keys = {key for key, digest in columns.items() if known.get(key) != digest}
+                self.stats["diff_uploads"] += 1
+        return SchemaPlan(key, fingerprint, unchanged=False, columns=columns, changed_keys=changed_keys)
+
+    def _columns(self, key: str) -> Dict[str, str]:
+        if self._conn is None:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                "select column_key, digest from schema_columns where group_key = ?", (key,)
+            ).fetchall()
+        return dict(rows)
+
+    def commit(self, plan: SchemaPlan) -> None:
+        """Record a plan's fingerprint once its upload succeeded."""
+        with self._lock:
+            self._remember(plan.key, plan.fingerprint)
+            if self._conn is None:
+                return
+            self._conn.execute("begin")
+            try:
+                self._conn.execute(
+                    """
+                    insert into schema_fingerprints (group_key, fingerprint, updated_at) values (?, ?, ?)
+                    on conflict (group_key) do update set fingerprint = excluded.fingerprint, updated_at = excluded.updated_at
+                    """,
+                    (plan.key, plan.fingerprint, time.time()),
+                )
+                if plan.columns is not None:
+                    self._conn.execute("delete from schema_columns where group_key = ?", (plan.key,))
+                    self._conn.executemany(
+                        "insert into schema_columns (group_key, column_key, digest) values (?, ?, ?)",
+                        [(plan.key, column_key, digest) for column_key, digest in plan.columns.items()],
+                    )
+                self._conn.execute("commit")
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+
+    def metrics(self) -> Dict[str, Any]:
+        decisions = self.stats["unchanged"] + self.stats["changed"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["unchanged"] / decisions, 4) if decisions else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "diff": self.diff,
+        }
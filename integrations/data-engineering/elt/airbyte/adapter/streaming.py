@@ -0,0 +1,160 @@
+"""
+Incremental parsing of Airbyte webhook bodies and streamed upload bodies
+
+Airbyte catalogs can hold hundreds of streams and tens of thousands of
+columns. Instead of loading the whole body into Python objects, the adapter:
+
+  - builds only the small top-level part of the event (connection, job,
+    attempt, ...) and skips the catalog subtrees,
+  - walks `catalog.streams` one stream at a time with ijson, flattening
+    nested object/array properties into one schema row per column,
+  - writes schema rows straight into a chunked multipart request body.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+import ijson
+
+from qalita_json import SchemaRecord, dumps
+
+
+# Top-level keys that may carry a catalog; never materialized as a whole
+CATALOG_KEYS = ("catalog", "syncedCatalog")
+
+# Size of the chunks handed to httpx when streaming an upload body
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+def parse_event_header(raw: bytes) -> Dict[str, Any]:
+    """Parse a webhook body, keeping every top-level key except the catalogs.
+
+    Raises ValueError when the body is not a JSON object.
+    """
+    header: Dict[str, Any] = {}
+    key: Optional[str] = None
+    builder: Optional[ijson.ObjectBuilder] = None
+    events = ijson.parse(raw, use_float=True)
+    try:
+        first = next(events)
+    except StopIteration:
+        raise ValueError("empty body")
+    if first[:2] != ("", "start_map"):
+        raise ValueError("webhook body must be a JSON object")
+    for prefix, event, value in events:
+        if prefix == "" and event in ("map_key", "end_map"):
+            if builder is not None and key is not None:
+                header[key] = builder.value
+            key = value if event == "map_key" else None
+            builder = ijson.ObjectBuilder() if key is not None and key not in CATALOG_KEYS else None
+            continue
+        if builder is not None:
+            builder.event(event, value)
+    return header
+
+
+def _stream_identity(stream: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any]]:
+    inner = stream.get("stream", {}) or {}
+    name = inner.get("name") or stream.get("name")
+    json_schema = inner.get("jsonSchema") or stream.get("jsonSchema") or {}
+    return name, json_schema
+
+
+def _flatten_properties(
+    stream_name: Optional[str],
+    properties: Dict[str, Any],
+    parent: str = "",
+) -> Iterator[SchemaRecord]:
+    for col_name, col_schema in properties.items():
+        column = f"{parent}{col_name}"
+        col_schema = col_schema if isinstance(col_schema, dict) else {}
+        # Store one line per column
+        yield SchemaRecord(
+            key=f"{stream_name}.{column}",
+            value=str(col_schema.get("type")),
+            scope={"stream": stream_name, "column": column},
+        )
+        nested = col_schema.get("properties")
+        if isinstance(nested, dict):
+            yield from _flatten_properties(stream_name, nested, parent=f"{column}.")
+        items = col_schema.get("items")
+        if isinstance(items, dict) and isinstance(items.get("properties"), dict):
+            yield from _flatten_properties(stream_name, items["properties"], parent=f"{column}[].")
+
+
+def iter_schemas_from_airbyte(raw: bytes) -> Iterator[SchemaRecord]:
+    """Yield one schema row per (possibly nested) column, one stream at a time."""
+    for catalog_key in CATALOG_KEYS:
+        found = False
+        for stream in ijson.items(raw, f"{catalog_key}.streams.item", use_float=True):
+            found = True
+            stream_name, json_schema = _stream_identity(stream)
+            properties = json_schema.get("properties")
+            if isinstance(properties, dict):
+                yield from _flatten_properties(stream_name, properties)
+        # `syncedCatalog` is only a fallback when `catalog` carries no stream
+        if found:
+            return
+
+
+def iter_merged_schemas(raws: Iterable[bytes]) -> Iterator[SchemaRecord]:
+    """Schema rows of several events; later events win on duplicate keys."""
+    raws = list(raws)
+    if len(raws) == 1:
+        # Nothing to merge; keep memory flat instead of tracking every key
+        yield from iter_schemas_from_airbyte(raws[0])
+        return
+    seen: Set[str] = set()
+    for raw in reversed(raws):
+        for schema in iter_schemas_from_airbyte(raw):
+            if schema.key in seen:
+                continue
+            seen.add(schema.key)
+            yield schema
+
+
+def has_schemas(raws: Iterable[bytes]) -> bool:
+    return any(next(iter_schemas_from_airbyte(raw), None) is not None for raw in raws)
+
+
+async def multipart_json_array(
+    fields: Dict[str, str],
+    filename: str,
+    records: Iterable[Any],
+    boundary: str,
+) -> AsyncIterator[bytes]:
+    """Encode form fields plus a JSON array file part as a streamed multipart body."""
+    head = bytearray()
+    for name, value in fields.items():
+        head += (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n"
+        ).encode("utf-8")
+    head += (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/json\r\n\r\n["
+    ).encode("utf-8")
+
+    buffer = head
+    first = True
+    for record in records:
+        if not first:
+            buffer += b","
+        first = False
+        buffer += dumps(record)
+        if len(buffer) >= UPLOAD_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer = bytearray()
+            # Parsing the catalog is CPU-bound; let other tasks run between chunks
+            await asyncio.sleep(0)
+    buffer += f"]\r\n--{boundary}--\r\n".encode("utf-8")
+    yield bytes(buffer)
+
+
+def new_boundary() -> str:
+    return uuid.uuid4().hex
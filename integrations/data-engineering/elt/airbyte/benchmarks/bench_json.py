@@ -0,0 +1,78 @@
+"""
+Benchmark: encode/decode throughput of qalita_json backends.
+
+Builds a large synthetic list of metric and schema records and times each
+installed backend (msgspec, orjson, stdlib json) on it, plus stdlib
+`json.dumps(..., indent=2)` on plain dicts as the previous baseline.
+
+Run from this directory (adapter dependencies installed, orjson optional):
+  python bench_json.py --records 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "adapter"))
+
+import qalita_json  # noqa: E402
+from qalita_json import Metric, SchemaRecord  # noqa: E402
+
+
+def build_records(n: int) -> list:
+    records = []
+    for i in range(n):
+        if i % 2:
+            records.append(Metric(
+                key="expectation_result",
+                value={"expectation": "expect_column_values_to_not_be_null", "success": bool(i % 3)},
+                scope={"perimeter": "dataset", "value": f"dataset_{i % 97}", "env": "dev"},
+            ))
+        else:
+            records.append(SchemaRecord(
+                key=f"stream_{i % 211}.column_{i}",
+                value="['string', 'null']",
+                scope={"stream": f"stream_{i % 211}", "column": f"column_{i}"},
+            ))
+    return records
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200000, help="Number of synthetic records")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N timing")
+    args = parser.parse_args()
+
+    records = build_records(args.records)
+    plain = qalita_json.to_builtins(records)
+    size_mb = len(qalita_json.dumps(records, backend="json")) / 1e6
+    print(f"{args.records} records, {size_mb:.1f} MB compact JSON")
+    print(f"{'backend':<18}{'encode MB/s':>14}{'decode MB/s':>14}")
+
+    baseline = json.dumps(plain, indent=2)
+    encode = timed(lambda: json.dumps(plain, indent=2), args.repeat)
+    decode = timed(lambda: json.loads(baseline), args.repeat)
+    print(f"{'json indent=2':<18}{len(baseline) / 1e6 / encode:>14.1f}{len(baseline) / 1e6 / decode:>14.1f}")
+
+    for backend in qalita_json.BACKENDS:
+        data = qalita_json.dumps(records, backend=backend)
+        encode = timed(lambda: qalita_json.dumps(records, backend=backend), args.repeat)
+        decode = timed(lambda: qalita_json.loads(data, backend=backend), args.repeat)
+        print(f"{backend:<18}{len(data) / 1e6 / encode:>14.1f}{len(data) / 1e6 / decode:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Micro-benchmark: per-request cost of resolving QALITA ids for a connection.
+
+Compares the previous per-request path (parse the config file, then build a
+new QalitaIds) with the cached `ConfigCache.get()` + `pick_ids` lookup.
+
+Run from this directory (adapter dependencies installed):
+  python bench_pick_ids.py --connections 5000 --requests 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "adapter"))
+
+from app import ConfigCache, QalitaIds, load_config, pick_ids  # noqa: E402
+
+
+def write_config(path: str, connections: int) -> list[str]:
+    ids = {"source_id": 1, "source_version_id": 1, "pack_id": 1, "pack_version_id": 1}
+    connection_ids = [f"conn-{n:06d}" for n in range(connections)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"connection_map": {c: ids for c in connection_ids}, "default": ids}, f)
+    return connection_ids
+
+
+def pick_ids_uncached(connection_id: str) -> QalitaIds:
+    # Previous behaviour: parse the whole file and re-validate the ids on every webhook
+    cfg = load_config()
+    return QalitaIds(**cfg.connection_map[connection_id].model_dump())
+
+
+def bench(label: str, fn, keys: list[str]) -> float:
+    start = time.perf_counter()
+    for key in keys:
+        fn(key)
+    elapsed = time.perf_counter() - start
+    per_call_us = elapsed / len(keys) * 1e6
+    print(f"{label:<10} {per_call_us:12.2f} µs/request")
+    return per_call_us
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=5000, help="Number of mapped Airbyte connections")
+    parser.add_argument("--requests", type=int, default=2000, help="Number of lookups to time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "config.json")
+        connection_ids = write_config(path, args.connections)
+        os.environ["ADAPTER_CONFIG_PATH"] = path
+        keys = [random.choice(connection_ids) for _ in range(args.requests)]
+
+        cache = ConfigCache(path)
+        print(f"{args.connections} mapped connections, {args.requests} requests")
+        before = bench("before", pick_ids_uncached, keys)
+        after = bench("after", lambda key: pick_ids(cache.get(), key), keys)
+        print(f"speedup    {before / after:12.0f}x")
+
+
+if __name__ == "__main__":
+    main()
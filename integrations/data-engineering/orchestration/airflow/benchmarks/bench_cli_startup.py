@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Measure QALITA task startup: cold CLI import, in-process and isolated calls
+
+Compares what a task paid before (a fresh interpreter importing the CLI and
+registering commands, on every DAG parse and task) with the cached in-process
+registry and forks from the warm forkserver. Also checks that concurrent
+isolated calls each see their own environment: every call gets its own HOME
+holding a QALITA source config, and `source list` must print that source.
+
+Usage:
+  python benchmarks/bench_cli_startup.py [--runs 5] [--concurrency 4]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DAGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dags")
+sys.path.insert(0, DAGS_DIR)
+
+from _lib import qalita_cli  # noqa: E402
+
+
+COLD_TASK = (
+    "from qalita.__main__ import cli, add_commands_to_cli; add_commands_to_cli(); "
+    "cli.main(args=['version'], prog_name='qalita', standalone_mode=False)"
+)
+
+
+def _median_ms(samples):
+    return round(statistics.median(samples) * 1000, 1)
+
+
+def _time_subprocess(code: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, env={**os.environ, "PYTHONPATH": DAGS_DIR})
+        samples.append(time.perf_counter() - start)
+    return _median_ms(samples)
+
+
+def _home_with_source(root: str, name: str) -> str:
+    home = os.path.join(root, name)
+    os.makedirs(os.path.join(home, ".qalita"))
+    with open(os.path.join(home, ".qalita", "sources-conf.yaml"), "w") as f:
+        f.write(f"version: 1\nsources:\n- id: 1\n  name: {name}\n  type: file\n")
+    return home
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"fresh interpreter, no import       : {_time_subprocess('pass', args.runs)} ms")
+    print(f"fresh interpreter, import CLI       : {_time_subprocess('import qalita.__main__', args.runs)} ms  (before: paid on every DAG parse)")
+    print(f"fresh interpreter, import _lib      : {_time_subprocess('import _lib.qalita_cli', args.runs)} ms  (after: DAG parse)")
+    print(f"cold task (import, register, call)  : {_time_subprocess(COLD_TASK, args.runs)} ms  (before: every task)")
+
+    first = qalita_cli.run(["version"], {}, mode="inprocess")
+    warm = [qalita_cli.run(["version"], {}, mode="inprocess").seconds for _ in range(args.runs)]
+    print(f"inprocess: load {round(qalita_cli.cli_load_seconds * 1000, 1)} ms, first call {round(first.seconds * 1000, 1)} ms, next calls {_median_ms(warm)} ms")
+
+    start = time.perf_counter()
+    qalita_cli.warm_up()
+    warm_up_ms = round((time.perf_counter() - start) * 1000, 1)
+    isolated = [qalita_cli.run(["version"], {}, mode="isolated").seconds for _ in range(args.runs)]
+    print(f"isolated: forkserver warm-up {warm_up_ms} ms, calls {_median_ms(isolated)} ms")
+
+    with tempfile.TemporaryDirectory() as root:
+        homes = {f"source_{n}": _home_with_source(root, f"source_{n}") for n in range(args.concurrency * 2)}
+        for mode in qalita_cli.INVOCATION_MODES:
+            before_env, before_cwd = dict(os.environ), os.getcwd()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                results = dict(
+                    zip(homes, pool.map(lambda home: qalita_cli.run(["source", "list"], {"HOME": home}, cwd=home, mode=mode), homes.values()))
+                )
+            elapsed = round((time.perf_counter() - start) * 1000, 1)
+            isolated_ok = all(r.return_code == 0 and name in r.stdout and all(other not in r.stdout for other in homes if other != name) for name, r in results.items())
+            unchanged = dict(os.environ) == before_env and os.getcwd() == before_cwd
+            print(f"{mode}: {len(homes)} concurrent `source list` in {elapsed} ms, own env in each call: {isolated_ok}, caller env/cwd unchanged: {unchanged}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from airflow.models import BaseOperator
+from airflow.utils.context import Context
+
+from _lib import qalita_cli
+
+Pair = Tuple[str, str]
+PairsArg = Union[str, Sequence[Any]]
+
+
+def _normalize_pairs(pairs: PairsArg) -> List[Pair]:
+    """Pairs given as [{"source_id", "pack_id"}, ...] or [[source_id, pack_id], ...], or as their JSON."""
+    if isinstance(pairs, str):
+        pairs = json.loads(pairs) if pairs.strip() else []
+    normalized: List[Pair] = []
+    for pair in pairs:
+        if isinstance(pair, dict):
+            normalized.append((str(pair["source_id"]), str(pair["pack_id"])))
+        else:
+            source_id, pack_id = pair
+            normalized.append((str(source_id), str(pack_id)))
+    # Duplicates would run the same checks twice
+    return list(dict.fromkeys(normalized))
+
+
+def batch_pairs(pairs: PairsArg, batch_size: int = 20) -> List[List[Pair]]:
+    """Split pairs into batches, to map one QalitaBatchRunOperator task per batch with `expand(pairs=...)`."""
+    normalized = _normalize_pairs(pairs)
+    size = max(1, batch_size)
+    return [normalized[start : start + size] for start in range(0, len(normalized), size)]
+
+
+class QalitaBatchRunOperator(BaseOperator):
+    """Run `qalita agent run -s <source_id> -p <pack_id>` for many pairs within one task.
+
+    Pairs run concurrently, up to `max_concurrency` at once, each in its own
+    process forked from the warm QALITA CLI (see `_lib/qalita_cli.py`), so one
+    task replaces hundreds of scheduled tasks. For more parallelism than one
+    worker slot gives, map the operator over `batch_pairs(...)` and bound the
+    mapped tasks with a pool or `max_active_tis_per_dag`.
+
+    Parameters
+    ----------
+    pairs : Union[str, Sequence]
+        [{"source_id": ..., "pack_id": ...}, ...] or [[source_id, pack_id], ...], or their
+        JSON (e.g. rendered from a Variable).
+    max_concurrency : int
+        Agent runs at once in this task.
+    env : Optional[Dict[str, str]]
+        Extra environment variables for each run (merged over os.environ).
+    cwd : Optional[str]
+        Working directory of each run.
+    fail_on_error : bool
+        Fail the task, after pushing the summary, if any pair failed.
+
+    Returns (and pushes to XCom) a compact summary: counts, total seconds, seconds
+    per phase summed over the pairs, and [source_id, pack_id, return_code, seconds]
+    per pair; output is only logged.
+    """
+
+    template_fields: Sequence[str] = ("pairs", "env")
+
+    def __init__(
+        self,
+        pairs: PairsArg,
+        max_concurrency: int = 4,
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[str] = None,
+        fail_on_error: bool = True,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.pairs = pairs
+        self.max_concurrency = max(1, max_concurrency)
+        self.env = env or {}
+        self.cwd = cwd
+        self.fail_on_error = fail_on_error
+
+    def _run_pair(self, pair: Pair) -> qalita_cli.CliResult:
+        source_id, pack_id = pair
+        env_overrides = {"QALITA_AGENT_MODE": "job", **self.env}
+        # Only the tail of the output is kept (for failures), whatever its size
+        return qalita_cli.run(
+            ["agent", "run", "-s", source_id, "-p", pack_id], env_overrides, self.cwd, mode="isolated", max_stdout_chars=0
+        )
+
+    def execute(self, context: Context) -> Dict[str, Any]:
+        pairs = _normalize_pairs(self.pairs)
+        self.log.info("Running %d source/pack pair(s), %d at a time", len(pairs), self.max_concurrency)
+        qalita_cli.warm_up()
+
+        start = time.perf_counter()
+        by_index: Dict[int, List[Any]] = {}
+        failed_indexes: List[int] = []
+        phases: Dict[str, float] = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {pool.submit(self._run_pair, pair): index for index, pair in enumerate(pairs)}
+            # Results are logged as they complete; the summary keeps the order of the pairs
+            for future in as_completed(futures):
+                index = futures[future]
+                pair = pairs[index]
+                result = future.result()
+                ok = result.error is None and result.return_code == 0
+                self.log.info(
+                    "source %s / pack %s: exit code %d in %.1f s", pair[0], pair[1], result.return_code, result.seconds
+                )
+                if not ok:
+                    failed_indexes.append(index)
+                    tail = (result.error or result.stderr or result.stdout_tail).rstrip().splitlines()[-5:]
+                    self.log.error("\n".join(tail))
+                by_index[index] = [pair[0], pair[1], result.return_code, round(result.seconds, 3)]
+                for phase, seconds in result.phases.items():
+                    phases[phase] = phases.get(phase, 0.0) + seconds
+        results = [by_index[index] for index in range(len(pairs))]
+        failed: List[Pair] = [pairs[index] for index in sorted(failed_indexes)]
+
+        summary = {
+            "total": len(results),
+            "succeeded": len(results) - len(failed),
+            "failed": len(failed),
+            "seconds": round(time.perf_counter() - start, 3),
+            # Summed over the pairs
+            "phase_seconds": {phase: round(seconds, 3) for phase, seconds in phases.items()},
+            "results": results,
+        }
+        if failed and self.fail_on_error:
+            # The return value is not pushed when the task fails
+            context["ti"].xcom_push(key="return_value", value=summary)
+            raise RuntimeError(
+                f"{len(failed)} of {len(results)} QALITA agent run(s) failed: "
+                + ", ".join(f"{s}/{p}" for s, p in failed[:20])
+            )
+        return summary
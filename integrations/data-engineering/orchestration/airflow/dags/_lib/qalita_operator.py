@@ -1,14 +1,15 @@
 import os
 import shlex
-import io
-from contextlib import redirect_stdout, redirect_stderr
+import time
+from datetime import timedelta
 from typing import Any, Dict, List, Optional, Sequence, Union
 
 from airflow.models import BaseOperator
+from airflow.stats import Stats
 from airflow.utils.context import Context
 
-# Use qalita as a Python package (tools-cli). We'll programmatically invoke the Click CLI.
-from qalita.__main__ import cli as qalita_cli, add_commands_to_cli
+# The QALITA CLI (python package) is imported on first use by qalita_cli, not when the DAG file is parsed
+from _lib import qalita_cli
 
 
 class QalitaOperator(BaseOperator):
@@ -26,7 +27,23 @@ class QalitaOperator(BaseOperator):
     cwd : Optional[str]
         Working directory to run the process in.
     log_output : bool
-        If True, stream stdout/stderr to task logs. Always captures output and returns stdout.
+        If True, stream stdout/stderr lines to the task log as the command produces them.
+    max_output_chars : Optional[int]
+        Cap on the stdout kept and returned (pushed to XCom); all of it by default.
+        Error messages use the last lines of stderr whatever the cap.
+    invocation_mode : Optional[str]
+        "isolated": fork the call from a warm forkserver, with env/cwd local to the call
+        (safe for concurrent operators in one worker); "inprocess": run in the task process,
+        with env/cwd applied around the call and calls serialized. Defaults to env
+        `QALITA_CLI_INVOCATION` or "isolated".
+    profiler : Optional[str]
+        "cprofile" or "pyinstrument" (if installed) to profile the command; the profile
+        path is pushed to XCom (`qalita_profile`). Defaults to env `QALITA_CLI_PROFILER` (off).
+    profile_dir : Optional[str]
+        Directory of the profiles. Defaults to env `QALITA_CLI_PROFILE_DIR` or `<tmp>/qalita-profiles`.
+
+    Phase timings (import, register, invoke, isolation, output; seconds) are pushed
+    to XCom (`qalita_timings`) and emitted as `qalita.cli.<phase>` timers.
     """
 
     template_fields: Sequence[str] = ("command", "env")
@@ -38,6 +55,10 @@ class QalitaOperator(BaseOperator):
         env: Optional[Dict[str, str]] = None,
         cwd: Optional[str] = None,
         log_output: bool = True,
+        max_output_chars: Optional[int] = None,
+        invocation_mode: Optional[str] = None,
+        profiler: Optional[str] = None,
+        profile_dir: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
         super().__init__(**kwargs)
@@ -46,6 +67,12 @@ class QalitaOperator(BaseOperator):
         self.extra_env = env or {}
         self.cwd = cwd
         self.log_output = log_output
+        self.max_output_chars = max_output_chars
+        self.invocation_mode = invocation_mode or os.environ.get("QALITA_CLI_INVOCATION", "isolated")
+        if self.invocation_mode not in qalita_cli.INVOCATION_MODES:
+            raise ValueError(f"invocation_mode must be one of {qalita_cli.INVOCATION_MODES}, got {self.invocation_mode!r}")
+        self.profiler = profiler or os.environ.get("QALITA_CLI_PROFILER") or None
+        self.profile_dir = profile_dir or os.environ.get("QALITA_CLI_PROFILE_DIR") or None
 
     def _build_args(self) -> List[str]:
         if isinstance(self.command, str):
@@ -54,80 +81,65 @@ class QalitaOperator(BaseOperator):
             args = list(self.command)
         return args
 
-    def _with_temp_cwd_and_env(self, func, env: Dict[str, str]) -> Any:
-        previous_cwd = os.getcwd()
-        previous_env: Dict[str, Optional[str]] = {}
-        for key, value in env.items():
-            previous_env[key] = os.environ.get(key)
-        try:
-            if self.cwd:
-                os.chdir(self.cwd)
-            os.environ.update(env)
-            return func()
-        finally:
-            # restore env
-            for key, prev in previous_env.items():
-                if prev is None and key in os.environ:
-                    del os.environ[key]
-                elif prev is not None:
-                    os.environ[key] = prev
-            # restore cwd
-            if self.cwd:
-                os.chdir(previous_cwd)
+    def _log_line(self, stream: str, line: str) -> None:
+        if stream == "stdout":
+            self.log.info(line)
+        else:
+            # click may send warnings/info to stderr
+            self.log.warning(line)
+
+    def _report_timings(self, context: Context, result: qalita_cli.CliResult, total_seconds: float) -> None:
+        timings = {phase: round(seconds, 4) for phase, seconds in result.phases.items()}
+        timings["total"] = round(total_seconds, 4)
+        self.log.info(
+            "QALITA CLI timings: %s", ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in timings.items())
+        )
+        for phase, seconds in timings.items():
+            Stats.timing(f"qalita.cli.{phase}", timedelta(seconds=seconds))
+        context["ti"].xcom_push(key="qalita_timings", value=timings)
+        if result.profile_path:
+            self.log.info("QALITA CLI profile written to %s", result.profile_path)
+            context["ti"].xcom_push(key="qalita_profile", value=result.profile_path)
 
     def execute(self, context: Context) -> str:
-        # Merge extra env over current env; applied temporarily within the call
+        # Extra env is applied to the CLI call only
         env_overrides: Dict[str, str] = dict(self.extra_env)
         args = self._build_args()
 
-        # Ensure CLI commands are registered
-        add_commands_to_cli()
-
-        self.log.info("Running QALITA (python package) with args: %s", " ".join(shlex.quote(p) for p in args))
+        self.log.info(
+            "Running QALITA (python package, %s) with args: %s",
+            self.invocation_mode,
+            " ".join(shlex.quote(p) for p in args),
+        )
         if self.cwd:
             self.log.info("Working directory: %s", self.cwd)
 
-        stdout_buffer = io.StringIO()
-        stderr_buffer = io.StringIO()
-
-        def _invoke_cli() -> int:
-            with redirect_stdout(stdout_buffer), redirect_stderr(stderr_buffer):
-                # Use Click's main entry with standalone_mode=False to avoid sys.exit
-                return int(
-                    qalita_cli.main(
-                        args=args,
-                        prog_name="qalita",
-                        standalone_mode=False,
-                    )
-                    or 0
-                )
-
-        try:
-            return_code = self._with_temp_cwd_and_env(_invoke_cli, env_overrides)
-        except SystemExit as exc:
-            # click can still raise SystemExit; capture code
-            return_code = int(getattr(exc, "code", 1) or 0)
-        except Exception as exc:
+        start = time.perf_counter()
+        result = qalita_cli.run(
+            args,
+            env_overrides,
+            self.cwd,
+            mode=self.invocation_mode,
+            on_line=self._log_line if self.log_output else None,
+            max_stdout_chars=self.max_output_chars,
+            profiler=self.profiler,
+            profile_dir=self.profile_dir,
+        )
+        self._report_timings(context, result, time.perf_counter() - start)
+
+        out = result.stdout
+        err = result.stderr
+
+        if result.error is not None:
             # Unexpected error
-            if self.log_output:
-                err = stderr_buffer.getvalue()
-                if err:
-                    self.log.error(err.rstrip())
-            raise RuntimeError(f"QALITA CLI raised an exception: {exc}")
-
-        out = stdout_buffer.getvalue()
-        err = stderr_buffer.getvalue()
-
-        if self.log_output:
-            if out:
-                self.log.info(out.rstrip())
-            if err:
-                # click may send warnings/info to stderr
-                self.log.warning(err.rstrip())
-
-        if return_code != 0:
+            raise RuntimeError(f"QALITA CLI raised an exception: {result.error}")
+
+        if result.stdout_truncated:
+            self.log.warning("Returned stdout truncated to its first %d characters", self.max_output_chars)
+
+        if result.return_code != 0:
             raise RuntimeError(
-                f"QALITA CLI exited with code {return_code}. Stderr: {err}"
+                f"QALITA CLI exited with code {result.return_code}. Stderr: {err}"
             )
 
         return out
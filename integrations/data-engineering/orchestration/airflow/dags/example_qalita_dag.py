@@ -3,6 +3,7 @@ from datetime import datetime
 from airflow import DAG
 from airflow.operators.bash import BashOperator
 
+from _lib.qalita_batch_operator import QalitaBatchRunOperator
 from _lib.qalita_operator import QalitaOperator
 
 
@@ -58,6 +59,14 @@ with DAG(
         },
     )
 
+    # Many source/pack pairs in one task, 4 agent runs at a time
+    # Pairs from the Variable, e.g. {"pairs": [{"source_id": "1", "pack_id": "1"}, ["2", "1"]]}
+    qalita_agent_runs = QalitaBatchRunOperator(
+        task_id="qalita_agent_runs",
+        pairs="{{ var.json.qalita_params.pairs | default([]) | tojson }}",
+        max_concurrency=4,
+    )
+
     # Helper commands (optional) to explore configured entities
     qalita_source_list = QalitaOperator(
         task_id="qalita_source_list",
@@ -70,3 +79,4 @@ with DAG(
 
     extract >> transform >> qalita_cli_version >> qalita_agent_login
     qalita_agent_login >> [qalita_source_list, qalita_pack_list] >> qalita_agent_run
+    [qalita_source_list, qalita_pack_list] >> qalita_agent_runs
@@ -3,6 +3,7 @@ import os
 from dagster import Definitions
 from dotenv import load_dotenv
 
+from .jobs.agent_run_fan_out import build_agent_run_fan_out_job
 from .jobs.example_qalita_job import example_qalita_job
 from .resources.qalita_resource import QalitaResource
 
@@ -11,8 +12,12 @@ from .resources.qalita_resource import QalitaResource
 load_dotenv()
 
 
+# Source/pack pairs are given in the run config (see run_config.fan_out.example.yaml)
+qalita_agent_runs = build_agent_run_fan_out_job()
+
+
 defs = Definitions(
-    jobs=[example_qalita_job],
+    jobs=[example_qalita_job, qalita_agent_runs],
     resources={
         "qalita": QalitaResource(
             # Use environment variable defaults if not provided
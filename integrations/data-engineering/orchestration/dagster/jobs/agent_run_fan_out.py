@@ -0,0 +1,167 @@
+"""Fan out `agent run` over many source/pack pairs in one Dagster job.
+
+`build_agent_run_fan_out_job` returns a job of three ops:
+
+- `<name>_plan` resolves the pairs (op config, or the factory's list or query)
+  and emits them in batches as dynamic outputs;
+- `<name>_run` is mapped over the batches: each runs its pairs through
+  `QalitaResource`, up to `max_concurrency` at once, and never raises, so
+  that one failing pair does not hide the others;
+- `<name>_report` collects every result into one asset materialization
+  (counts, durations and phase timings, per-pair exit codes and output tail), then fails the
+  run if any pair failed (`fail_on_error`).
+
+Batching keeps the number of steps (each a process with the multiprocess
+executor) independent of the number of pairs: throughput is bounded by
+`max_concurrent_steps` x the resource's `max_concurrency`.
+"""
+
+import itertools
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from dagster import (
+    AssetKey,
+    AssetMaterialization,
+    DynamicOut,
+    DynamicOutput,
+    Failure,
+    Field,
+    MetadataValue,
+    Output,
+    job,
+    multiprocess_executor,
+    op,
+)
+
+Pair = Tuple[str, str]
+# Static pairs, or a query called with the plan op's context (e.g. listing sources with the resource)
+PairsSource = Union[Sequence[Pair], Callable[[Any], Iterable[Pair]]]
+
+# Lines of stdout kept per pair in the report
+OUTPUT_TAIL_LINES = 5
+
+
+def _config_pairs(config: Dict[str, Any]) -> List[Pair]:
+    pairs = [(str(p["source_id"]), str(p["pack_id"])) for p in config.get("pairs") or []]
+    source_ids = config.get("source_ids") or []
+    pack_ids = config.get("pack_ids") or []
+    pairs.extend((str(s), str(p)) for s, p in itertools.product(source_ids, pack_ids))
+    return pairs
+
+
+def _output_tail(text: str) -> str:
+    return "\n".join(text.rstrip().splitlines()[-OUTPUT_TAIL_LINES:])
+
+
+def _run_pair(qalita: Any, pair: Pair) -> Dict[str, Any]:
+    source_id, pack_id = pair
+    # Only the tail of the output is kept, whatever its size
+    result = qalita.invoke(["agent", "run", "-s", source_id, "-p", pack_id], max_stdout_chars=0)
+    return {
+        "source_id": source_id,
+        "pack_id": pack_id,
+        "return_code": result.return_code,
+        "seconds": round(result.seconds, 3),
+        "error": result.error,
+        "stdout_tail": _output_tail(result.stdout_tail),
+        "stderr_tail": _output_tail(result.stderr),
+        "phases": {phase: round(seconds, 4) for phase, seconds in result.phases.items()},
+        "profile_path": result.profile_path,
+    }
+
+
+def _summary_table(results: List[Dict[str, Any]]) -> str:
+    rows = ["| source | pack | exit code | seconds |", "|---|---|---|---|"]
+    for r in sorted(results, key=lambda r: (r["return_code"] == 0, r["source_id"], r["pack_id"])):
+        rows.append(f"| {r['source_id']} | {r['pack_id']} | {r['return_code']} | {r['seconds']} |")
+    return "\n".join(rows)
+
+
+def build_agent_run_fan_out_job(
+    name: str = "qalita_agent_runs",
+    pairs: Optional[PairsSource] = None,
+    batch_size: int = 10,
+    max_concurrent_steps: int = 4,
+    asset_key: Optional[Sequence[str]] = None,
+):
+    """Job running `agent run -s <source> -p <pack>` for many pairs, aggregated into one materialization.
+
+    Pairs come from the run config of `<name>_plan` (`pairs`, and/or the product of
+    `source_ids` x `pack_ids`), falling back to `pairs` given here.
+    """
+    report_asset_key = AssetKey(list(asset_key or ["qalita", name]))
+
+    @op(
+        name=f"{name}_plan",
+        out=DynamicOut(list),
+        required_resource_keys={"qalita"},
+        config_schema={
+            "pairs": Field([{"source_id": str, "pack_id": str}], is_required=False),
+            "source_ids": Field([str], is_required=False, description="Crossed with pack_ids"),
+            "pack_ids": Field([str], is_required=False),
+            "batch_size": Field(int, default_value=batch_size),
+        },
+    )
+    def plan(context):
+        resolved = _config_pairs(context.op_config)
+        if not resolved and pairs is not None:
+            resolved = [(str(s), str(p)) for s, p in (pairs(context) if callable(pairs) else pairs)]
+        # Duplicates would run the same checks twice
+        resolved = list(dict.fromkeys(resolved))
+        size = max(1, context.op_config["batch_size"])
+        context.log.info(f"{len(resolved)} source/pack pair(s) in batches of {size}")
+        for start in range(0, len(resolved), size):
+            yield DynamicOutput(resolved[start : start + size], mapping_key=f"batch_{start // size:04d}")
+
+    @op(name=f"{name}_run", required_resource_keys={"qalita"})
+    def run_batch(context, batch: list) -> list:
+        qalita = context.resources.qalita
+        # The resource bounds concurrent calls; a pool of that size keeps every slot busy
+        with ThreadPoolExecutor(max_workers=max(1, qalita.max_concurrency)) as pool:
+            results = list(pool.map(lambda pair: _run_pair(qalita, pair), batch))
+        failed = sum(1 for r in results if r["return_code"] != 0)
+        context.log.info(f"{len(results)} pair(s) run, {failed} failed")
+        return results
+
+    @op(name=f"{name}_report", config_schema={"fail_on_error": Field(bool, default_value=True)})
+    def report(context, batches: list):
+        results = [r for batch in batches for r in batch]
+        failed = [r for r in results if r["return_code"] != 0]
+        durations = [r["seconds"] for r in results]
+        phase_seconds: Dict[str, float] = {}
+        for r in results:
+            for phase, seconds in r["phases"].items():
+                phase_seconds[phase] = round(phase_seconds.get(phase, 0.0) + seconds, 4)
+        yield AssetMaterialization(
+            asset_key=report_asset_key,
+            description=f"agent run over {len(results)} source/pack pair(s)",
+            metadata={
+                "pairs": len(results),
+                "succeeded": len(results) - len(failed),
+                "failed": len(failed),
+                "total_seconds": round(sum(durations), 3),
+                "median_seconds": statistics.median(durations) if durations else 0.0,
+                "max_seconds": max(durations, default=0.0),
+                # Summed over the pairs: import, register, invoke, isolation, output
+                "phase_seconds": MetadataValue.json(phase_seconds),
+                "summary": MetadataValue.md(_summary_table(results)),
+                "results": MetadataValue.json(results),
+            },
+        )
+        yield Output(results)
+        if failed and context.op_config["fail_on_error"]:
+            raise Failure(
+                description=f"{len(failed)} of {len(results)} agent run(s) failed",
+                metadata={"failed_pairs": MetadataValue.json([[r["source_id"], r["pack_id"]] for r in failed])},
+            )
+
+    @job(
+        name=name,
+        executor_def=multiprocess_executor.configured({"max_concurrent": max_concurrent_steps}),
+    )
+    def fan_out_job():
+        report(plan().map(run_batch).collect())
+
+    return fan_out_job
@@ -37,7 +37,8 @@ def qalita_pack_list(context):
 def qalita_agent_run(context):
     source_id = context.op_config.get("source_id", "1")
     pack_id = context.op_config.get("pack_id", "1")
-    context.resources.qalita.run(["agent", "run", "-s", str(source_id), "-p", str(pack_id)])
+    # Phase timings (and profile, if enabled) are attached to the op's output metadata
+    context.resources.qalita.run(["agent", "run", "-s", str(source_id), "-p", str(pack_id)], context=context)
 
 
 @job
@@ -0,0 +1,394 @@
+"""Warm invocation of the QALITA CLI (python package).
+
+Importing `qalita` and registering its command groups takes most of a QALITA
+task's startup time, so it is done lazily (not when the DAG file is parsed)
+and once per process: `load_cli` caches the registered Click group.
+
+Commands run in one of two modes:
+
+- ``inprocess``: in the calling process. Environment variables and working
+  directory are applied around the call and restored afterwards; since they
+  are process-global, calls in one process are serialized by a lock.
+- ``isolated``: in a child process forked from a warm forkserver, which has
+  already imported the CLI. The child gets the caller's current environment
+  with `env` applied, and `cwd` or else the caller's working directory, as
+  in ``inprocess`` mode (not the forkserver's, frozen when it started).
+  They are the child's only, so calls can run concurrently, and a fork
+  costs a few milliseconds instead of a fresh interpreter and import. Daemonic processes
+  cannot start children: there, calls fall back to ``inprocess``.
+
+Output is streamed line by line as the command produces it (to `on_line`,
+e.g. a task logger) rather than buffered until it ends. A call keeps only
+the last `TAIL_LINES` lines of each stream and, optionally, stdout up to
+`max_stdout_chars`, so its memory does not grow with the output.
+
+Each result carries the seconds spent per phase: ``import`` and ``register``
+(when the call loaded the CLI), ``invoke`` (the command itself),
+``isolation`` (fork and transfer, isolated calls) and ``output`` (in
+`on_line`). With `profiler="cprofile"` (or ``"pyinstrument"``, if installed)
+the command is profiled and the profile written under `profile_dir`.
+
+This module is shared by the Airflow and Dagster examples (one copy per integration).
+"""
+
+import importlib.util
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence
+
+INVOCATION_MODES = ("inprocess", "isolated")
+PROFILERS = ("cprofile", "pyinstrument")
+
+# Imported by the forkserver before it forks workers
+_PRELOAD = ["qalita.__main__", "qalita.commands.agent", "qalita.commands.pack", "qalita.commands.source"]
+
+_COMMAND_GROUPS = ("agent", "pack", "source")
+
+# Lines kept of each stream, for error messages
+TAIL_LINES = 50
+# Longer lines (e.g. output without newlines) are split
+MAX_LINE_CHARS = 64 * 1024
+
+# Called with ("stdout" | "stderr", line) for each line of output, as it is produced
+LineCallback = Callable[[str, str], None]
+
+
+@dataclass
+class CliResult:
+    return_code: int
+    # Up to max_stdout_chars of stdout (all of it by default)
+    stdout: str
+    # Last TAIL_LINES lines of each stream
+    stderr: str
+    seconds: float
+    # Message of an unexpected exception raised by the CLI
+    error: Optional[str] = None
+    stdout_tail: str = ""
+    stdout_truncated: bool = False
+    # Seconds per phase (import, register, invoke, isolation, output)
+    phases: Dict[str, float] = field(default_factory=dict)
+    profile_path: Optional[str] = None
+
+
+class LineWriter(io.TextIOBase):
+    """Text stream passing each complete line written to `emit` (without its newline)."""
+
+    def __init__(self, emit: Callable[[str], None]) -> None:
+        super().__init__()
+        self._emit = emit
+        self._partial: List[str] = []
+        self._partial_chars = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        lines = text.split("\n")
+        for line in lines[:-1]:
+            self._partial.append(line)
+            self._emit_partial()
+        if lines[-1]:
+            self._partial.append(lines[-1])
+            self._partial_chars += len(lines[-1])
+            if self._partial_chars >= MAX_LINE_CHARS:
+                self._emit_partial()
+        return len(text)
+
+    def _emit_partial(self) -> None:
+        line = "".join(self._partial)
+        self._partial, self._partial_chars = [], 0
+        self._emit(line)
+
+    def close(self) -> None:
+        # An unterminated last line is still output
+        if self._partial:
+            self._emit_partial()
+        super().close()
+
+
+class OutputCollector:
+    """Keeps the tail of each stream and stdout up to a cap, forwarding every line to `on_line`."""
+
+    def __init__(self, on_line: Optional[LineCallback] = None, max_stdout_chars: Optional[int] = None) -> None:
+        self.on_line = on_line
+        self.max_stdout_chars = max_stdout_chars
+        self.tails: Dict[str, Deque[str]] = {"stdout": deque(maxlen=TAIL_LINES), "stderr": deque(maxlen=TAIL_LINES)}
+        # Lines with their newline, up to the first `max_stdout_chars` characters
+        self._stdout: List[str] = []
+        self._stdout_chars = 0
+        self.stdout_truncated = False
+        self.output_seconds = 0.0
+
+    def line(self, stream: str, text: str) -> None:
+        self.tails[stream].append(text)
+        if stream == "stdout" and not self.stdout_truncated:
+            text_nl = text + "\n"
+            if self.max_stdout_chars is not None and self._stdout_chars + len(text_nl) > self.max_stdout_chars:
+                # Keep what still fits of the overflowing line, then nothing after it
+                text_nl = text_nl[: self.max_stdout_chars - self._stdout_chars]
+                self.stdout_truncated = True
+            if text_nl:
+                self._stdout.append(text_nl)
+                self._stdout_chars += len(text_nl)
+        if self.on_line is not None:
+            start = time.perf_counter()
+            self.on_line(stream, text)
+            self.output_seconds += time.perf_counter() - start
+
+    def complete(self, result: CliResult) -> CliResult:
+        result.stdout = "".join(self._stdout)
+        result.stderr = "".join(f"{line}\n" for line in self.tails["stderr"])
+        result.stdout_tail = "".join(f"{line}\n" for line in self.tails["stdout"])
+        result.stdout_truncated = self.stdout_truncated
+        result.phases["output"] = self.output_seconds
+        return result
+
+
+_cli: Any = None
+_cli_lock = threading.Lock()
+_run_lock = threading.Lock()
+_context: Any = None
+_context_lock = threading.Lock()
+
+# Seconds spent importing and registering the CLI in this process (None: not loaded)
+cli_load_seconds: Optional[float] = None
+cli_load_phases: Dict[str, float] = {}
+
+
+def load_cli() -> Any:
+    """Import the QALITA CLI and register its command groups, once per process."""
+    global _cli, cli_load_seconds, cli_load_phases
+    if _cli is not None:
+        return _cli
+    with _cli_lock:
+        if _cli is None:
+            start = time.perf_counter()
+            from qalita.__main__ import add_commands_to_cli, cli
+
+            imported = time.perf_counter()
+            # Idempotent: another caller may already have registered the groups
+            if not all(name in cli.commands for name in _COMMAND_GROUPS):
+                add_commands_to_cli()
+            end = time.perf_counter()
+            cli_load_phases = {"import": imported - start, "register": end - imported}
+            cli_load_seconds = end - start
+            _cli = cli
+    return _cli
+
+
+def _load_cli_timed() -> Dict[str, float]:
+    """Load the CLI; the import/register phases if this call loaded it, else nothing."""
+    if _cli is not None:
+        return {}
+    load_cli()
+    return dict(cli_load_phases)
+
+
+def _exit_code(exc: SystemExit) -> int:
+    code = getattr(exc, "code", 1)
+    if code is None or isinstance(code, int):
+        return int(code or 0)
+    # SystemExit("message")
+    return 1
+
+
+@contextmanager
+def _profiled(profiler: Optional[str], path: Optional[str]) -> Iterator[None]:
+    if profiler is None or path is None:
+        yield
+    elif profiler == "cprofile":
+        import cProfile
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(path)
+    else:
+        from pyinstrument import Profiler
+
+        sampler = Profiler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(sampler.output_html())
+
+
+def _profile_path(profiler: str, directory: Optional[str], args: List[str]) -> str:
+    directory = directory or os.path.join(tempfile.gettempdir(), "qalita-profiles")
+    os.makedirs(directory, exist_ok=True)
+    command = "-".join(arg for arg in args[:2] if not arg.startswith("-")) or "cli"
+    extension = ".prof" if profiler == "cprofile" else ".html"
+    return os.path.join(directory, f"qalita-{command}-{time.strftime('%Y%m%dT%H%M%S')}-{os.urandom(3).hex()}{extension}")
+
+
+def _invoke(args: List[str], emit: LineCallback, profiler: Optional[str] = None, profile_path: Optional[str] = None) -> CliResult:
+    phases = _load_cli_timed()
+    cli = load_cli()
+    stdout_writer = LineWriter(lambda line: emit("stdout", line))
+    stderr_writer = LineWriter(lambda line: emit("stderr", line))
+    error = None
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(stdout_writer), redirect_stderr(stderr_writer), _profiled(profiler, profile_path):
+            # Use Click's main entry with standalone_mode=False to avoid sys.exit
+            return_code = int(cli.main(args=args, prog_name="qalita", standalone_mode=False) or 0)
+    except SystemExit as exc:
+        # click can still raise SystemExit; capture code
+        return_code = _exit_code(exc)
+    except Exception as exc:
+        return_code = 1
+        error = str(exc)
+    finally:
+        stdout_writer.close()
+        stderr_writer.close()
+    phases["invoke"] = time.perf_counter() - start
+    return CliResult(
+        return_code, "", "", phases["invoke"], error, phases=phases, profile_path=profile_path if profiler else None
+    )
+
+
+def run_in_process(
+    args: List[str],
+    env: Dict[str, str],
+    cwd: Optional[str] = None,
+    output: Optional[OutputCollector] = None,
+    profiler: Optional[str] = None,
+    profile_path: Optional[str] = None,
+) -> CliResult:
+    """Run the CLI in this process with env/cwd applied for the duration of the call."""
+    output = output or OutputCollector()
+    # Loaded outside the lock; the phases are reported by the call that loaded it
+    load_phases = _load_cli_timed()
+    with _run_lock:
+        previous_cwd = os.getcwd()
+        previous_env = {key: os.environ.get(key) for key in env}
+        try:
+            if cwd:
+                os.chdir(cwd)
+            os.environ.update(env)
+            result = _invoke(args, output.line, profiler, profile_path)
+            result.phases.update(load_phases)
+            return output.complete(result)
+        finally:
+            # restore env
+            for key, prev in previous_env.items():
+                if prev is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = prev
+            # restore cwd
+            if cwd:
+                os.chdir(previous_cwd)
+
+
+def _forkserver_context() -> Any:
+    global _context
+    with _context_lock:
+        if _context is None:
+            context = multiprocessing.get_context("forkserver")
+            # Modules that fail to import are skipped by the forkserver, and imported by the child instead
+            context.set_forkserver_preload([__name__, *_PRELOAD])
+            _context = context
+    return _context
+
+
+def warm_up() -> None:
+    """Start the forkserver (importing the CLI in it) ahead of the first isolated call."""
+    from multiprocessing import forkserver
+
+    _forkserver_context()
+    forkserver.ensure_running()
+
+
+def _child(
+    conn: Any, args: List[str], env: Dict[str, str], cwd: Optional[str], profiler: Optional[str], profile_path: Optional[str]
+) -> None:
+    # Lines are sent to the parent as they are written, then the result
+    try:
+        # Replace the forkserver's environment: `env` is the caller's, already merged
+        os.environ.clear()
+        os.environ.update(env)
+        if cwd:
+            os.chdir(cwd)
+        result = _invoke(args, lambda stream, line: conn.send((stream, line)), profiler, profile_path)
+    except BaseException as exc:
+        result = CliResult(1, "", "", 0.0, f"{type(exc).__name__}: {exc}")
+    conn.send(("result", result))
+    conn.close()
+
+
+def run_isolated(
+    args: List[str],
+    env: Dict[str, str],
+    cwd: Optional[str] = None,
+    output: Optional[OutputCollector] = None,
+    profiler: Optional[str] = None,
+    profile_path: Optional[str] = None,
+) -> CliResult:
+    """Run the CLI in a child forked from the warm forkserver, in the caller's environment and directory."""
+    output = output or OutputCollector()
+    context = _forkserver_context()
+    start = time.perf_counter()
+    receiver, sender = context.Pipe(duplex=False)
+    child_env = {**os.environ, **env}
+    child_cwd = cwd or os.getcwd()
+    process = context.Process(
+        target=_child, args=(sender, list(args), child_env, child_cwd, profiler, profile_path), daemon=True
+    )
+    process.start()
+    sender.close()
+    result = None
+    try:
+        while result is None:
+            kind, payload = receiver.recv()
+            if kind == "result":
+                result = payload
+            else:
+                output.line(kind, payload)
+    except EOFError:
+        process.join()
+        result = CliResult(process.exitcode or 1, "", "", 0.0, f"CLI worker exited with code {process.exitcode}")
+    finally:
+        receiver.close()
+    process.join()
+    # Include the fork and the output transfer
+    result.seconds = time.perf_counter() - start
+    result.phases["isolation"] = max(0.0, result.seconds - sum(result.phases.values()))
+    return output.complete(result)
+
+
+def run(
+    args: Sequence[str],
+    env: Dict[str, str],
+    cwd: Optional[str] = None,
+    mode: str = "isolated",
+    on_line: Optional[LineCallback] = None,
+    max_stdout_chars: Optional[int] = None,
+    profiler: Optional[str] = None,
+    profile_dir: Optional[str] = None,
+) -> CliResult:
+    if mode not in INVOCATION_MODES:
+        raise ValueError(f"Unknown invocation mode {mode!r}; expected one of {INVOCATION_MODES}")
+    if profiler is not None and profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler {profiler!r}; expected one of {PROFILERS}")
+    if profiler == "pyinstrument" and importlib.util.find_spec("pyinstrument") is None:
+        raise ValueError("pyinstrument is not installed: pip install pyinstrument, or use profiler='cprofile'")
+    args = list(args)
+    profile_path = _profile_path(profiler, profile_dir, args) if profiler else None
+    output = OutputCollector(on_line, max_stdout_chars)
+    if mode == "isolated" and not multiprocessing.current_process().daemon:
+        return run_isolated(args, env, cwd, output, profiler, profile_path)
+    return run_in_process(args, env, cwd, output, profiler, profile_path)
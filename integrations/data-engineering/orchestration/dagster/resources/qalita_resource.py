@@ -1,13 +1,32 @@
 import os
 import shlex
-import io
-from contextlib import redirect_stdout, redirect_stderr
+import threading
 from typing import Any, Dict, Optional, Sequence, Union
 
-from dagster import ConfigurableResource
+from dagster import ConfigurableResource, InitResourceContext, MetadataValue, OpExecutionContext, get_dagster_logger
 
-# Use qalita as a Python package (tools-cli). We'll programmatically invoke the Click CLI.
-from qalita.__main__ import cli as qalita_cli, add_commands_to_cli
+# The QALITA CLI (python package) is imported on first use by qalita_cli, not when definitions are loaded
+from . import qalita_cli
+
+
+# Process-wide call slots, one semaphore per max_concurrency value
+_slots: Dict[int, threading.BoundedSemaphore] = {}
+_slots_lock = threading.Lock()
+
+
+def _call_slots(max_concurrency: int) -> threading.BoundedSemaphore:
+    with _slots_lock:
+        if max_concurrency not in _slots:
+            _slots[max_concurrency] = threading.BoundedSemaphore(max_concurrency)
+        return _slots[max_concurrency]
+
+
+def timing_metadata(result: qalita_cli.CliResult) -> Dict[str, Any]:
+    """Dagster metadata of a CLI call: seconds per phase, and the profile if one was written."""
+    metadata: Dict[str, Any] = {f"qalita_{phase}_seconds": round(seconds, 4) for phase, seconds in result.phases.items()}
+    if result.profile_path:
+        metadata["qalita_profile"] = MetadataValue.path(result.profile_path)
+    return metadata
 
 
 class QalitaResource(ConfigurableResource):
@@ -19,6 +38,21 @@ class QalitaResource(ConfigurableResource):
     - QALITA_AGENT_TOKEN
     - QALITA_AGENT_NAME (default: "dagster-agent")
     - QALITA_AGENT_MODE (default: "job")
+
+    Each call runs in a child process forked from a warm forkserver that has
+    already imported the CLI (`invocation_mode="isolated"`), so env, cwd and
+    stdout/stderr are local to the call and parallel ops (or threads within an
+    op) do not interfere. At most `max_concurrency` calls run at once in a
+    process. `invocation_mode="inprocess"` runs calls in the op process instead,
+    one at a time.
+
+    With `log_output`, output lines go to the Dagster logger as the command
+    produces them. `run()` returns stdout, up to `max_output_chars` if set.
+
+    Each call's phase timings (import, register, invoke, isolation, output) are
+    logged, and added to the op's output metadata when `run()` is given the op
+    context. `profiler` ("cprofile", or "pyinstrument" if installed) profiles
+    every call into `profile_dir` (default: `<tmp>/qalita-profiles`).
     """
 
     endpoint: Optional[str] = None
@@ -27,6 +61,22 @@ class QalitaResource(ConfigurableResource):
     agent_mode: Optional[str] = "job"
     cwd: Optional[str] = None
     log_output: bool = True
+    max_output_chars: Optional[int] = None
+    invocation_mode: str = "isolated"
+    max_concurrency: int = 4
+    profiler: Optional[str] = None
+    profile_dir: Optional[str] = None
+
+    def setup_for_execution(self, context: InitResourceContext) -> None:
+        if self.invocation_mode not in qalita_cli.INVOCATION_MODES:
+            raise ValueError(f"invocation_mode must be one of {qalita_cli.INVOCATION_MODES}, got {self.invocation_mode!r}")
+        if self.max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {self.max_concurrency}")
+        if self.profiler is not None and self.profiler not in qalita_cli.PROFILERS:
+            raise ValueError(f"profiler must be one of {qalita_cli.PROFILERS}, got {self.profiler!r}")
+        if self.invocation_mode == "isolated":
+            # Start the forkserver (and import the CLI in it) before the first op needs it
+            qalita_cli.warm_up()
 
     def _build_args(self, command: Union[str, Sequence[str]]) -> Sequence[str]:
         if isinstance(command, str):
@@ -54,79 +104,75 @@ class QalitaResource(ConfigurableResource):
             env.update(extra_env)
         return env
 
-    def _with_temp_cwd_and_env(self, func, env: Dict[str, str]) -> Any:
-        previous_cwd = os.getcwd()
-        previous_env: Dict[str, Optional[str]] = {}
-        for key, value in env.items():
-            previous_env[key] = os.environ.get(key)
-        try:
-            if self.cwd:
-                os.chdir(self.cwd)
-            os.environ.update(env)
-            return func()
-        finally:
-            # restore env
-            for key, prev in previous_env.items():
-                if prev is None and key in os.environ:
-                    del os.environ[key]
-                elif prev is not None:
-                    os.environ[key] = prev
-            # restore cwd
-            if self.cwd:
-                os.chdir(previous_cwd)
-
-    def run(self, command: Union[str, Sequence[str]], env: Optional[Dict[str, str]] = None) -> str:
-        """Run a QALITA CLI command via the python package, returning stdout.
+    def invoke(
+        self,
+        command: Union[str, Sequence[str]],
+        env: Optional[Dict[str, str]] = None,
+        on_line: Optional[qalita_cli.LineCallback] = None,
+        max_stdout_chars: Optional[int] = None,
+    ) -> qalita_cli.CliResult:
+        """Run a QALITA CLI command, returning its exit code, output and duration without raising.
 
-        Raises RuntimeError on non-zero exit code or unexpected exceptions.
+        `on_line(stream, line)` receives output lines as they are produced.
         """
         args = self._build_args(command)
 
-        # Ensure CLI commands are registered
-        add_commands_to_cli()
+        # Merge environment overrides (resource config/env + per-call env)
+        env_overrides = self._gather_env(extra_env=env)
 
-        stdout_buffer = io.StringIO()
-        stderr_buffer = io.StringIO()
+        with _call_slots(self.max_concurrency):
+            return qalita_cli.run(
+                args,
+                env_overrides,
+                self.cwd,
+                mode=self.invocation_mode,
+                on_line=on_line,
+                max_stdout_chars=max_stdout_chars,
+                profiler=self.profiler,
+                profile_dir=self.profile_dir,
+            )
 
-        def _invoke_cli() -> int:
-            with redirect_stdout(stdout_buffer), redirect_stderr(stderr_buffer):
-                # Use Click's main entry with standalone_mode=False to avoid sys.exit
-                return int(
-                    qalita_cli.main(
-                        args=args,
-                        prog_name="qalita",
-                        standalone_mode=False,
-                    )
-                    or 0
-                )
+    def run(
+        self,
+        command: Union[str, Sequence[str]],
+        env: Optional[Dict[str, str]] = None,
+        context: Optional[OpExecutionContext] = None,
+    ) -> str:
+        """Run a QALITA CLI command via the python package, returning stdout.
 
-        # Merge environment overrides (resource config/env + per-call env)
-        env_overrides = self._gather_env(extra_env=env)
+        Safe to call concurrently. Raises RuntimeError on non-zero exit code or unexpected exceptions.
+        With `context` (once per op with a single output), the call's timings are added to the output metadata.
+        """
+        logger = get_dagster_logger("qalita")
 
-        try:
-            return_code = self._with_temp_cwd_and_env(_invoke_cli, env_overrides)
-        except SystemExit as exc:
-            return_code = int(getattr(exc, "code", 1) or 0)
-        except Exception as exc:
-            err = stderr_buffer.getvalue()
-            if self.log_output and err:
-                # Best-effort print to stdout; Dagster ops can still capture logs
-                print(err.rstrip())
-            raise RuntimeError(f"QALITA CLI raised an exception: {exc}")
-
-        out = stdout_buffer.getvalue()
-        err = stderr_buffer.getvalue()
-
-        if self.log_output:
-            if out:
-                print(out.rstrip())
-            if err:
+        def log_line(stream: str, line: str) -> None:
+            if stream == "stdout":
+                logger.info(line)
+            else:
                 # click may send warnings/info to stderr
-                print(err.rstrip())
+                logger.warning(line)
+
+        result = self.invoke(command, env, on_line=log_line if self.log_output else None, max_stdout_chars=self.max_output_chars)
+        logger.info(
+            "QALITA CLI timings: " + ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in result.phases.items())
+        )
+        if result.profile_path:
+            logger.info(f"QALITA CLI profile written to {result.profile_path}")
+        if context is not None:
+            context.add_output_metadata(timing_metadata(result))
+
+        out = result.stdout
+        err = result.stderr
+
+        if result.error is not None:
+            raise RuntimeError(f"QALITA CLI raised an exception: {result.error}")
+
+        if result.stdout_truncated:
+            logger.warning(f"Returned stdout truncated to its first {self.max_output_chars} characters")
 
-        if return_code != 0:
+        if result.return_code != 0:
             raise RuntimeError(
-                f"QALITA CLI exited with code {return_code}. Stderr: {err}"
+                f"QALITA CLI exited with code {result.return_code}. Stderr: {err}"
             )
 
         return out
@@ -0,0 +1,230 @@
+"""
+Column-pruned, typed loading of the dataset validated by an expectation suite
+
+The suite tells which columns are needed and, for many expectations, which
+type they should have. Only those columns are read, with explicit types, by
+pyarrow: streamed CSV parsing, or memory-mapped Parquet and Arrow IPC
+(Feather v2) files. Strings are kept as pyarrow-backed pandas strings.
+
+A CSV column whose values do not fit the type implied by the suite (e.g. text
+in a column checked with `expect_column_values_to_be_between`) is kept as
+text, so bad data is still validated instead of failing the load. Columns
+without a hint are typed as `pd.read_csv` would: numbers and booleans are
+inferred, dates and times stay text.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+
+FORMATS = ("csv", "parquet", "arrow")
+
+CSV_BLOCK_SIZE = 1 << 20
+
+_SUFFIXES = {
+    ".csv": "csv",
+    ".txt": "csv",
+    ".gz": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+# Expectations that can only be evaluated with every column of the table
+_ALL_COLUMNS = {
+    "expect_table_columns_to_match_ordered_list",
+    "expect_table_columns_to_match_set",
+    "expect_table_column_count_to_equal",
+    "expect_table_column_count_to_be_between",
+    "expect_column_to_exist",
+}
+
+_NUMERIC = {
+    "expect_column_values_to_be_between",
+    "expect_column_min_to_be_between",
+    "expect_column_max_to_be_between",
+    "expect_column_mean_to_be_between",
+    "expect_column_median_to_be_between",
+    "expect_column_sum_to_be_between",
+    "expect_column_stdev_to_be_between",
+    "expect_column_quantile_values_to_be_between",
+}
+
+_STRING = {
+    "expect_column_values_to_match_regex",
+    "expect_column_values_to_not_match_regex",
+    "expect_column_values_to_match_regex_list",
+    "expect_column_values_to_not_match_regex_list",
+    "expect_column_values_to_match_strftime_format",
+    "expect_column_values_to_be_dateutil_parseable",
+    "expect_column_value_lengths_to_be_between",
+    "expect_column_value_lengths_to_equal",
+}
+
+
+def detect_format(path: str) -> str:
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix not in _SUFFIXES:
+        raise ValueError(f"Cannot infer the format of {path}; pass one of: {', '.join(FORMATS)}")
+    return _SUFFIXES[suffix]
+
+
+def _columns_of(kwargs: Dict[str, Any]) -> List[str]:
+    columns = [kwargs[k] for k in ("column", "column_A", "column_B") if kwargs.get(k)]
+    columns += list(kwargs.get("column_list") or [])
+    return columns
+
+
+def required_columns(expectations: Iterable[Dict[str, Any]]) -> Optional[List[str]]:
+    """Columns referenced by the expectations, or None when every column is needed."""
+    columns: List[str] = []
+    for exp in expectations:
+        if exp.get("expectation_type") in _ALL_COLUMNS:
+            return None
+        for column in _columns_of(exp.get("kwargs", {})):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+
+def _declared_type(type_name: str) -> Optional[pa.DataType]:
+    name = type_name.lower()
+    if "int" in name:
+        return pa.int64()
+    if any(t in name for t in ("float", "double", "decimal")):
+        return pa.float64()
+    if "bool" in name:
+        return pa.bool_()
+    if "str" in name or name == "object":
+        return pa.string()
+    return None
+
+
+def column_types(expectations: Iterable[Dict[str, Any]]) -> Dict[str, pa.DataType]:
+    """Types implied by the suite; columns with conflicting hints are left to inference."""
+    hints: Dict[str, set] = {}
+    for exp in expectations:
+        exp_type = exp.get("expectation_type")
+        kwargs = exp.get("kwargs", {})
+        column = kwargs.get("column")
+        if not column:
+            continue
+        hint = None
+        if exp_type in _NUMERIC:
+            hint = pa.float64()
+        elif exp_type in _STRING:
+            hint = pa.string()
+        elif exp_type == "expect_column_values_to_be_of_type" and kwargs.get("type_"):
+            hint = _declared_type(str(kwargs["type_"]))
+        if hint is not None:
+            hints.setdefault(column, set()).add(hint)
+    return {column: next(iter(types)) for column, types in hints.items() if len(types) == 1}
+
+
+_STRING_DTYPES = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+
+
+def _to_pandas(table: pa.Table) -> pd.DataFrame:
+    return table.to_pandas(types_mapper=_STRING_DTYPES.get, date_as_object=False)
+
+
+def _csv_header(path: str) -> List[str]:
+    # Reads the first block only; handles compressed files like read_csv does
+    with pa_csv.open_csv(path) as reader:
+        return reader.schema.names
+
+
+# Types tried, in pandas' order, for columns without a hint read back as text
+_INFERRED_TYPES = (pa.int64(), pa.float64(), pa.bool_())
+
+
+def _cast_column(table: pa.Table, column: str, data_type: pa.DataType) -> Optional[pa.Table]:
+    try:
+        converted = table.column(column).cast(data_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+    return table.set_column(table.schema.get_field_index(column), column, converted)
+
+
+def _read_csv(path: str, columns: Optional[List[str]], types: Dict[str, pa.DataType]) -> pa.Table:
+    def open_reader(column_types: Dict[str, pa.DataType]) -> pa_csv.CSVStreamingReader:
+        # Streaming keeps only the selected columns plus one block in memory,
+        # where a one-shot read_csv buffers the whole file
+        return pa_csv.open_csv(
+            path,
+            read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columns,
+                column_types=column_types,
+                strings_can_be_null=True,
+            ),
+        )
+
+    # Types of the columns without a hint are inferred from the first block
+    with open_reader(types) as reader:
+        schema = reader.schema
+    # pd.read_csv keeps dates and times as text: so do columns pyarrow would parse as such
+    text = {f.name: pa.string() for f in schema if f.name not in types and pa.types.is_temporal(f.type)}
+    try:
+        with open_reader({**types, **text}) as reader:
+            return reader.read_all()
+    except pa.ArrowInvalid:
+        pass
+    # Some column does not fit its expected type, or its values change type after the first block:
+    # read every column as text and keep the casts that succeed
+    with open_reader({name: pa.string() for name in schema.names}) as reader:
+        table = reader.read_all()
+    for column in schema.names:
+        if column in types:
+            candidates = (types[column],)
+        elif column in text:
+            continue
+        else:
+            candidates = _INFERRED_TYPES
+        for data_type in candidates:
+            converted = _cast_column(table, column, data_type)
+            if converted is not None:
+                table = converted
+                break
+    return table
+
+
+def load_dataset(path: str, expectations: List[Dict[str, Any]], fmt: str = "auto") -> pd.DataFrame:
+    """Load the columns the expectations need from a CSV, Parquet or Arrow IPC file."""
+    fmt = detect_format(path) if fmt == "auto" else fmt
+    wanted = required_columns(expectations)
+
+    if fmt == "csv":
+        available = _csv_header(path)
+    elif fmt == "parquet":
+        available = pq.read_schema(path).names
+    elif fmt == "arrow":
+        with pa.memory_map(path) as source:
+            available = pa.ipc.open_file(source).schema.names
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    # Columns missing from the file are left out; their expectations then fail in GE
+    columns = None if wanted is None else [c for c in wanted if c in available]
+    if columns == []:
+        # Table-level expectations only (e.g. row count): one column is enough
+        columns = available[:1]
+
+    if fmt == "csv":
+        types = {c: t for c, t in column_types(expectations).items() if columns is None or c in columns}
+        table = _read_csv(path, columns, types)
+    elif fmt == "parquet":
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        table = feather.read_table(path, columns=columns, memory_map=True)
+    return _to_pandas(table)
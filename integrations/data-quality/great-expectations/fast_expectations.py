@@ -0,0 +1,247 @@
+"""
+Vectorized evaluation of common expectations
+
+Expectations are grouped by column. Each column is prepared once (null mask,
+non-null values, string view, duplicate mask) and all of its expectations are
+evaluated on that shared state with pandas/NumPy operations, instead of one
+PandasDataset call, and one full result object, per expectation.
+
+Semantics follow the legacy PandasDataset implementations: null values are
+ignored except by the null expectations, and `mostly` is compared with the
+share of successful non-null values.
+
+Expectation types missing from EVALUATORS, and options handled only by Great
+Expectations (row_condition, parse_strings_as_datetimes, non-numeric bounds,
+...), are left to Great Expectations.
+"""
+
+from __future__ import annotations
+
+import math
+import operator
+import re
+import warnings
+from collections import defaultdict
+from functools import cached_property
+from numbers import Number
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+class Unsupported(Exception):
+    """The expectation (or one of its options) must be evaluated by Great Expectations."""
+
+
+class ColumnState:
+    """Per-column data shared by all expectations on that column."""
+
+    def __init__(self, series: pd.Series) -> None:
+        self.series = series
+
+    @cached_property
+    def null_mask(self) -> np.ndarray:
+        return self.series.isna().to_numpy()
+
+    @cached_property
+    def nonnull(self) -> pd.Series:
+        return self.series[~self.null_mask]
+
+    @cached_property
+    def numeric(self) -> bool:
+        return pd.api.types.is_numeric_dtype(self.series) and not pd.api.types.is_bool_dtype(self.series)
+
+    @cached_property
+    def values(self) -> np.ndarray:
+        return self.nonnull.to_numpy(dtype=np.float64)
+
+    @cached_property
+    def strings(self) -> pd.Series:
+        # Same text as PandasDataset's `astype(str)`; string columns are used as-is
+        if pd.api.types.is_string_dtype(self.series) and not pd.api.types.is_object_dtype(self.series):
+            return self.nonnull
+        return self.nonnull.astype(str)
+
+    @cached_property
+    def unique_mask(self) -> np.ndarray:
+        return ~self.nonnull.duplicated(keep=False).to_numpy()
+
+
+Evaluator = Callable[[ColumnState, Dict[str, Any]], bool]
+
+
+def _map_success(success_count: int, nonnull_count: int, mostly: Optional[float]) -> bool:
+    if nonnull_count == 0:
+        return True
+    if mostly is not None:
+        return success_count / nonnull_count >= mostly
+    return success_count == nonnull_count
+
+
+def _bounds(kwargs: Dict[str, Any]) -> Tuple[Optional[float], Optional[float]]:
+    if kwargs.get("parse_strings_as_datetimes"):
+        raise Unsupported("parse_strings_as_datetimes")
+    min_value, max_value = kwargs.get("min_value"), kwargs.get("max_value")
+    for bound in (min_value, max_value):
+        if bound is not None and (not isinstance(bound, Number) or isinstance(bound, bool)):
+            raise Unsupported("non-numeric bounds")
+    return min_value, max_value
+
+
+def _in_bounds(value: Any, kwargs: Dict[str, Any]) -> Any:
+    """Vectorized (or scalar) bound test, inclusive unless strict_min/strict_max."""
+    min_value, max_value = _bounds(kwargs)
+    result = True
+    if min_value is not None:
+        result = (operator.gt if kwargs.get("strict_min") else operator.ge)(value, min_value)
+    if max_value is not None:
+        result = result & (operator.lt if kwargs.get("strict_max") else operator.le)(value, max_value)
+    return result
+
+
+def _not_be_null(state: ColumnState, kwargs: Dict[str, Any]) -> bool:
+    nulls = int(state.null_mask.sum())
+    return _map_success(len(state.series) - nulls, len(state.series), kwargs.get("mostly"))
+
+
+def _be_null(state: ColumnState, kwargs: Dict[str, Any]) -> bool:
+    return _map_success(int(state.null_mask.sum()), len(state.series), kwargs.get("mostly"))
+
+
+def _be_between(state: ColumnState, kwargs: Dict[str, Any]) -> bool:
+    min_value, max_value = _bounds(kwargs)
+    if min_value is None and max_value is None:
+        raise Unsupported("no bounds")
+    if min_value is not None and max_value is not None and min_value > max_value:
+        raise Unsupported("min_value > max_value")
+    if not state.numeric:
+        raise Unsupported("non-numeric column")
+    passed = int(np.count_nonzero(_in_bounds(state.values, kwargs)))
+    return _map_success(passed, len(state.nonnull), kwargs.get("mostly"))
+
+
+def _regex_matches(state: ColumnState, regex: str) -> int:
+    with warnings.catch_warnings():
+        # Only matches are counted: groups in suite patterns are expected
+        warnings.filterwarnings("ignore", "This pattern is interpreted as a regular expression", UserWarning)
+        try:
+            # pyarrow-backed strings are searched by Arrow; patterns RE2 rejects go through `re`
+            return int(state.strings.str.contains(regex).sum())
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, re.error):
+            return int(state.strings.astype(object).str.contains(regex).sum())
+
+
+def _match_regex(state: ColumnState, kwargs: Dict[str, Any]) -> bool:
+    passed = _regex_matches(state, kwargs["regex"])
+    return _map_success(passed, len(state.nonnull), kwargs.get("mostly"))
+
+
+def _not_match_regex(state: ColumnState, kwargs: Dict[str, Any]) -> bool:
+    passed = len(state.nonnull) - _regex_matches(state, kwargs["regex"])
+    return _map_success(passed, len(state.nonnull), kwargs.get("mostly"))
+
+
+def _be_unique(state: ColumnState, kwargs: Dict[str, Any]) -> bool:
+    return _map_success(int(state.unique_mask.sum()), len(state.nonnull), kwargs.get("mostly"))
+
+
+def _be_in_set(state: ColumnState, kwargs: Dict[str, Any]) -> bool:
+    if kwargs.get("parse_strings_as_datetimes"):
+        raise Unsupported("parse_strings_as_datetimes")
+    value_set = kwargs.get("value_set")
+    if value_set is None:
+        return True
+    passed = int(state.nonnull.isin(value_set).sum())
+    return _map_success(passed, len(state.nonnull), kwargs.get("mostly"))
+
+
+def _not_be_in_set(state: ColumnState, kwargs: Dict[str, Any]) -> bool:
+    if kwargs.get("parse_strings_as_datetimes"):
+        raise Unsupported("parse_strings_as_datetimes")
+    passed = len(state.nonnull) - int(state.nonnull.isin(kwargs.get("value_set")).sum())
+    return _map_success(passed, len(state.nonnull), kwargs.get("mostly"))
+
+
+def _aggregate(reduce: Callable[[np.ndarray], float], empty: float = math.nan) -> Evaluator:
+    def evaluate(state: ColumnState, kwargs: Dict[str, Any]) -> bool:
+        if not state.numeric:
+            raise Unsupported("non-numeric column")
+        # Like pandas, empty columns have a NaN min/max/mean (failing any bound) and a zero sum
+        value = reduce(state.values) if len(state.values) else empty
+        return bool(_in_bounds(value, kwargs))
+
+    return evaluate
+
+
+# Keyword arguments without effect on success
+_COMMON = {"result_format", "include_config", "catch_exceptions", "meta"}
+_MAP = _COMMON | {"column", "mostly", "row_condition", "condition_parser"}
+_BOUNDS = {"min_value", "max_value", "strict_min", "strict_max"}
+_AGGREGATE = _COMMON | _BOUNDS | {"column"}
+
+# Expectation type -> (evaluator, accepted kwargs); other kwargs are left to GE, which rejects them
+EVALUATORS: Dict[str, Tuple[Evaluator, Set[str]]] = {
+    "expect_column_values_to_not_be_null": (_not_be_null, _MAP | {"include_nulls"}),
+    "expect_column_values_to_be_null": (_be_null, _MAP),
+    "expect_column_values_to_be_between": (
+        _be_between,
+        _MAP | _BOUNDS | {"parse_strings_as_datetimes", "output_strftime_format", "allow_cross_type_comparisons"},
+    ),
+    "expect_column_values_to_match_regex": (_match_regex, _MAP | {"regex"}),
+    "expect_column_values_to_not_match_regex": (_not_match_regex, _MAP | {"regex"}),
+    "expect_column_values_to_be_unique": (_be_unique, _MAP),
+    "expect_column_values_to_be_in_set": (_be_in_set, _MAP | {"value_set", "parse_strings_as_datetimes"}),
+    "expect_column_values_to_not_be_in_set": (_not_be_in_set, _MAP | {"value_set", "parse_strings_as_datetimes"}),
+    "expect_column_min_to_be_between": (_aggregate(np.min), _AGGREGATE | {"parse_strings_as_datetimes", "output_strftime_format"}),
+    "expect_column_max_to_be_between": (_aggregate(np.max), _AGGREGATE | {"parse_strings_as_datetimes", "output_strftime_format"}),
+    "expect_column_mean_to_be_between": (_aggregate(np.mean), _AGGREGATE),
+    "expect_column_sum_to_be_between": (_aggregate(np.sum, empty=0.0), _AGGREGATE),
+}
+
+TABLE_EVALUATORS: Dict[str, Tuple[Callable[[pd.DataFrame, Dict[str, Any]], bool], Set[str]]] = {
+    "expect_table_row_count_to_be_between": (lambda df, kwargs: bool(_in_bounds(len(df), kwargs)), _COMMON | {"min_value", "max_value"}),
+    "expect_table_row_count_to_equal": (lambda df, kwargs: len(df) == kwargs.get("value"), _COMMON | {"value"}),
+}
+
+
+def evaluate(df: pd.DataFrame, expectations: List[Dict[str, Any]]) -> Tuple[Dict[int, bool], List[int]]:
+    """Evaluate the supported expectations.
+
+    Returns the success of each evaluated expectation by its index in
+    `expectations`, and the indexes left to Great Expectations.
+    """
+    successes: Dict[int, bool] = {}
+    fallback: List[int] = []
+    by_column: Dict[str, List[int]] = defaultdict(list)
+
+    for index, exp in enumerate(expectations):
+        exp_type = exp.get("expectation_type")
+        kwargs = exp.get("kwargs", {})
+        accepted = (EVALUATORS.get(exp_type) or TABLE_EVALUATORS.get(exp_type) or (None, set()))[1]
+        if kwargs.get("row_condition") or not set(kwargs) <= accepted:
+            fallback.append(index)
+        elif exp_type in TABLE_EVALUATORS:
+            try:
+                successes[index] = TABLE_EVALUATORS[exp_type][0](df, kwargs)
+            except Unsupported:
+                fallback.append(index)
+        elif kwargs.get("column"):
+            by_column[kwargs["column"]].append(index)
+        else:
+            fallback.append(index)
+
+    for column, indexes in by_column.items():
+        if column not in df.columns:
+            # PandasDataset raises on unknown columns, which counts as a failure
+            successes.update((index, False) for index in indexes)
+            continue
+        state = ColumnState(df[column])
+        for index in indexes:
+            exp = expectations[index]
+            try:
+                successes[index] = bool(EVALUATORS[exp["expectation_type"]][0](state, exp.get("kwargs", {})))
+            except Unsupported:
+                fallback.append(index)
+    return successes, sorted(fallback)
@@ -1,83 +1,132 @@
 #!/usr/bin/env python3
 import os
-import json
 import click
-import requests
-from typing import List, Dict, Any
+from typing import Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
+import qalita_json
+from qalita_json import Metric
+from qalita_upload import UploadError, UploadSettings, upload_metrics_file
 
-def ge_results_to_metrics(ge_json: Dict[str, Any], dataset_name: str, dataset_env: str):
-    results = ge_json.get("results") or ge_json.get("statistics", {}).get("evaluations") or []
-    metrics: List[Dict[str, Any]] = []
-    total = 0
-    passed = 0
+try:
+    import ijson
+except ImportError:  # pragma: no cover - optional dependency
+    ijson = None  # type: ignore
+
+
+OUTPUT_FORMATS = ("json", "ndjson")
 
+
+def _iter_outcomes_loaded(ge_file: str) -> Iterator[Tuple[Optional[str], bool]]:
+    # Without ijson: the whole validation JSON is loaded
+    ge_json = qalita_json.load(ge_file)
+    results = ge_json.get("results") or ge_json.get("statistics", {}).get("evaluations") or []
     if isinstance(results, list):
         for item in results:
             # Great Expectations v0.x typical shape
             exp_cfg = item.get("expectation_config", {}) if isinstance(item, dict) else {}
-            exp_type = exp_cfg.get("expectation_type")
             success = bool(item.get("success", False)) if isinstance(item, dict) else False
-            if exp_type:
-                metrics.append({
-                    "key": "expectation_result",
-                    "value": {"expectation": exp_type, "success": success},
-                    "scope": {"perimeter": "dataset", "value": dataset_name, "env": dataset_env},
-                })
-                total += 1
-                passed += 1 if success else 0
+            yield exp_cfg.get("expectation_type"), success
+
+
+def _iter_outcomes_streamed(ge_file: str, prefix: str, seen: List[bool]) -> Iterator[Tuple[Optional[str], bool]]:
+    type_prefix = f"{prefix}.expectation_config.expectation_type"
+    success_prefix = f"{prefix}.success"
+    exp_type: Optional[str] = None
+    success = False
+    with open(ge_file, "rb") as f:
+        # Parser events only: large payloads (unexpected_list, partial_unexpected_*) are never built
+        for event_prefix, event, value in ijson.parse(f):
+            if event_prefix == prefix:
+                seen[0] = True
+                if event == "start_map":
+                    exp_type, success = None, False
+                elif event == "end_map":
+                    yield exp_type, success
+            elif event_prefix == type_prefix and event == "string":
+                exp_type = value
+            elif event_prefix == success_prefix and event not in ("start_map", "start_array", "end_map", "end_array", "map_key"):
+                success = bool(value)
+
+
+def iter_expectation_outcomes(ge_file: str) -> Iterator[Tuple[Optional[str], bool]]:
+    """(expectation_type, success) of each result of a validation JSON, one result at a time."""
+    if ijson is None:
+        yield from _iter_outcomes_loaded(ge_file)
+        return
+    seen = [False]
+    yield from _iter_outcomes_streamed(ge_file, "results.item", seen)
+    if not seen[0]:
+        # Same fallback as for loaded documents, at the cost of a second pass
+        yield from _iter_outcomes_streamed(ge_file, "statistics.evaluations.item", seen)
+
+
+def ge_results_to_metrics(ge_file: str, dataset_name: str, dataset_env: str) -> Iterator[Metric]:
+    """Per-expectation metrics, then the score, streamed from a validation JSON."""
+    scope = {"perimeter": "dataset", "value": dataset_name, "env": dataset_env}
+    total = 0
+    passed = 0
+    for exp_type, success in iter_expectation_outcomes(ge_file):
+        if exp_type:
+            yield Metric(key="expectation_result", value={"expectation": exp_type, "success": success}, scope=scope)
+            total += 1
+            passed += 1 if success else 0
     # Compute score
     score = 1.0 if total == 0 else round(passed / total, 4)
-    metrics.append({
-        "key": "score",
-        "value": str(score),
-        "scope": {"perimeter": "dataset", "value": dataset_name, "env": dataset_env},
-    })
-    return metrics
+    yield Metric(key="score", value=str(score), scope=scope)
+
+
+def write_metrics(metrics: Iterator[Metric], out_path: str, output_format: str = "json") -> int:
+    """Write metrics as they come, as a compact JSON array or NDJSON (one per line)."""
+    count = 0
+    with open(out_path, "wb") as f:
+        if output_format == "json":
+            f.write(b"[")
+        for metric in metrics:
+            if output_format == "json" and count:
+                f.write(b",")
+            f.write(qalita_json.dumps(metric))
+            if output_format == "ndjson":
+                f.write(b"\n")
+            count += 1
+        if output_format == "json":
+            f.write(b"]")
+    return count
 
 
 def upload_metrics(metrics_path: str) -> None:
-    endpoint = os.getenv("QALITA_AGENT_ENDPOINT")
-    token = os.getenv("QALITA_AGENT_TOKEN")
-    source_id = os.getenv("QALITA_SOURCE_ID")
-    if not endpoint or not token:
+    settings = UploadSettings.from_env()
+    if settings is None:
         click.echo("QALITA_AGENT_ENDPOINT and QALITA_AGENT_TOKEN are required to upload. Skipping upload.")
         return
-    url = endpoint.rstrip("/") + "/api/v1/metrics/upload"
-    params = {}
-    if source_id:
-        params["source_id"] = source_id
-    verify = not bool(os.getenv("SKIP_SSL_VERIFY", ""))
-    with open(metrics_path, "rb") as f:
-        r = requests.post(url, headers={"Authorization": f"Bearer {token}"}, files={"file": f}, params=params, timeout=60, verify=verify)
-    if r.status_code == 200:
-        click.echo("Uploaded metrics to QALITA.")
-    else:
-        click.echo(f"Failed to upload metrics: {r.status_code} - {r.text}")
+    try:
+        report = upload_metrics_file(metrics_path, settings)
+    except UploadError as exc:
+        raise click.ClickException(
+            f"Failed to upload metrics: {exc}. Rerun, or `python qalita_upload.py {metrics_path}`, to resume."
+        )
+    click.echo(f"Uploaded metrics to QALITA: {report.sent} chunk(s) sent, {report.resumed} already sent, {report.retries} retries.")
 
 
 @click.command()
 @click.option("--file", "ge_file", required=True, help="Path to Great Expectations validation JSON")
 @click.option("--dataset-name", default=os.getenv("DATASET_NAME", "retail"), show_default=True)
 @click.option("--env", "dataset_env", default=os.getenv("DATASET_ENV", "dev"), show_default=True)
+@click.option("--output-format", type=click.Choice(OUTPUT_FORMATS), default="json", show_default=True, help="json: metrics.json array; ndjson: metrics.ndjson, one metric per line")
 @click.option("--no-upload", is_flag=True, help="Do not upload metrics to QALITA")
-def main(ge_file: str, dataset_name: str, dataset_env: str, no_upload: bool):
+def main(ge_file: str, dataset_name: str, dataset_env: str, output_format: str, no_upload: bool):
     load_dotenv(override=False)
     if not os.path.isfile(ge_file):
         raise FileNotFoundError(f"GE JSON file not found: {ge_file}")
-    with open(ge_file, "r", encoding="utf-8") as f:
-        ge_json = json.load(f)
-    metrics = ge_results_to_metrics(ge_json, dataset_name, dataset_env)
+    if ijson is None:
+        click.echo("ijson is not installed: loading the whole validation JSON in memory.")
     os.makedirs("artifacts", exist_ok=True)
-    metrics_path = os.path.join("artifacts", "metrics.json")
-    with open(metrics_path, "w", encoding="utf-8") as f:
-        json.dump(metrics, f, indent=2)
-    click.echo(f"Metrics written to {metrics_path}")
+    metrics_path = os.path.join("artifacts", f"metrics.{output_format}")
+    count = write_metrics(ge_results_to_metrics(ge_file, dataset_name, dataset_env), metrics_path, output_format)
+    click.echo(f"{count} metrics written to {metrics_path}")
     if not no_upload:
         upload_metrics(metrics_path)
 
 
 if __name__ == "__main__":
     main()
-\"EOF\"
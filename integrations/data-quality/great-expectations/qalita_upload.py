@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Chunked, resumable metrics upload to QALITA
+
+The metrics file (JSON array or NDJSON) is read incrementally and split into
+chunks of at most QALITA_UPLOAD_CHUNK_BYTES, each posted to
+/api/v1/metrics/upload as its own file. Chunks are sent in parallel over a
+pooled session. Connection errors, timeouts, truncated responses, 429 and
+5xx responses are retried with jittered exponential backoff (honouring
+Retry-After); any request error ends as an UploadError.
+
+Progress is checkpointed next to the metrics file (`<file>.upload.json`),
+keyed by the file content and the target, so an interrupted upload resumes
+with the chunks that were not acknowledged, including after the metrics were
+regenerated identically. The checkpoint is removed once every chunk is sent.
+
+Environment variables:
+  - QALITA_AGENT_ENDPOINT / QALITA_AGENT_TOKEN: API URL and token (required)
+  - QALITA_SOURCE_ID: source the metrics belong to
+  - SKIP_SSL_VERIFY: any value disables TLS verification
+  - QALITA_UPLOAD_CHUNK_BYTES: max serialized size of a chunk (default: 4194304)
+  - QALITA_UPLOAD_WORKERS: chunks sent concurrently (default: 4)
+  - QALITA_UPLOAD_MAX_ATTEMPTS: attempts per chunk (default: 5)
+  - QALITA_UPLOAD_BACKOFF_BASE / QALITA_UPLOAD_BACKOFF_MAX: retry backoff bounds in seconds (default: 1 / 30)
+
+Resume an interrupted upload without re-running the validation:
+  python qalita_upload.py artifacts/metrics.json
+
+This file is shared verbatim by the integration examples that upload metrics.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, Optional, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import qalita_json
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - optional dependency
+    ijson = None  # type: ignore
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Transient transport errors (SSLError is a ConnectionError); other request errors fail at once
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+UPLOAD_PATH = "/api/v1/metrics/upload"
+
+
+class UploadError(Exception):
+    """A chunk could not be uploaded; the checkpoint keeps the chunks already sent."""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class UploadSettings:
+    endpoint: str
+    token: str
+    source_id: Optional[str] = None
+    verify: bool = True
+    chunk_bytes: int = 4 * 1024 * 1024
+    workers: int = 4
+    max_attempts: int = 5
+    backoff_base: float = 1.0
+    backoff_max: float = 30.0
+    timeout: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> Optional["UploadSettings"]:
+        """Settings from the environment, or None when the endpoint or token is missing."""
+        endpoint = os.getenv("QALITA_AGENT_ENDPOINT")
+        token = os.getenv("QALITA_AGENT_TOKEN")
+        if not endpoint or not token:
+            return None
+        return cls(
+            endpoint=endpoint.rstrip("/"),
+            token=token,
+            source_id=os.getenv("QALITA_SOURCE_ID") or None,
+            verify=not bool(os.getenv("SKIP_SSL_VERIFY", "")),
+            chunk_bytes=max(1024, _env_int("QALITA_UPLOAD_CHUNK_BYTES", cls.chunk_bytes)),
+            workers=max(1, _env_int("QALITA_UPLOAD_WORKERS", cls.workers)),
+            max_attempts=max(1, _env_int("QALITA_UPLOAD_MAX_ATTEMPTS", cls.max_attempts)),
+            backoff_base=_env_float("QALITA_UPLOAD_BACKOFF_BASE", cls.backoff_base),
+            backoff_max=_env_float("QALITA_UPLOAD_BACKOFF_MAX", cls.backoff_max),
+        )
+
+
+@dataclass
+class UploadReport:
+    chunks: int = 0
+    sent: int = 0
+    resumed: int = 0
+    retries: int = 0
+    bytes_sent: int = 0
+
+
+def _is_ndjson(path: str) -> bool:
+    return path.endswith((".ndjson", ".jsonl"))
+
+
+def iter_metric_items(path: str) -> Iterator[bytes]:
+    """Serialized metrics of a JSON array or NDJSON file, one at a time."""
+    if _is_ndjson(path):
+        with open(path, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+        return
+    if ijson is None:
+        for item in qalita_json.load(path):
+            yield qalita_json.dumps(item)
+        return
+    with open(path, "rb") as f:
+        for item in ijson.items(f, "item", use_float=True):
+            yield qalita_json.dumps(item)
+
+
+def iter_chunks(path: str, chunk_bytes: int) -> Iterator[bytes]:
+    """Chunk bodies in the file's format; a metric larger than chunk_bytes is sent alone."""
+    ndjson = _is_ndjson(path)
+    items: list = []
+    size = 2
+    for item in iter_metric_items(path):
+        if items and size + len(item) + 1 > chunk_bytes:
+            yield _chunk_body(items, ndjson)
+            items, size = [], 2
+        items.append(item)
+        size += len(item) + 1
+    if items:
+        yield _chunk_body(items, ndjson)
+
+
+def _chunk_body(items: list, ndjson: bool) -> bytes:
+    if ndjson:
+        return b"\n".join(items) + b"\n"
+    return b"[" + b",".join(items) + b"]"
+
+
+class Checkpoint:
+    """Indexes of the chunks already acknowledged for one (file content, target)."""
+
+    def __init__(self, metrics_path: str, identity: str) -> None:
+        self.path = f"{metrics_path}.upload.json"
+        self.identity = identity
+        self.done: Set[int] = set()
+        self._lock = threading.Lock()
+        try:
+            state = qalita_json.load(self.path)
+        except (OSError, ValueError):
+            return
+        # A checkpoint for other content, target or chunking does not apply
+        if isinstance(state, dict) and state.get("identity") == identity:
+            self.done = set(state.get("done", []))
+
+    def mark(self, index: int) -> None:
+        with self._lock:
+            self.done.add(index)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(qalita_json.dumps({"identity": self.identity, "done": sorted(self.done)}))
+            os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _identity(path: str, settings: UploadSettings) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(f"|{settings.endpoint}|{settings.source_id}|{settings.chunk_bytes}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _retry_delay(attempt: int, settings: UploadSettings, response: Optional[requests.Response]) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(settings.backoff_max, float(retry_after))
+    # Full jitter, so parallel chunks that failed together do not retry together
+    return random.uniform(0, min(settings.backoff_max, settings.backoff_base * (2 ** attempt)))
+
+
+def make_session(settings: UploadSettings) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Authorization"] = f"Bearer {settings.token}"
+    session.verify = settings.verify
+    return session
+
+
+def _send_chunk(
+    session: requests.Session, settings: UploadSettings, index: int, body: bytes, filename: str, content_type: str
+) -> int:
+    """Send one chunk, retrying transient failures; returns the number of retries, raises UploadError."""
+    retries = 0
+    params: Dict[str, Any] = {}
+    if settings.source_id:
+        params["source_id"] = settings.source_id
+    for attempt in range(settings.max_attempts):
+        response = None
+        try:
+            response = session.post(
+                settings.endpoint + UPLOAD_PATH,
+                files={"file": (filename, body, content_type)},
+                params=params,
+                timeout=settings.timeout,
+            )
+        except requests.RequestException as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            if not isinstance(exc, RETRY_EXCEPTIONS):
+                break
+        else:
+            if response.status_code == 200:
+                return retries
+            error = f"{response.status_code} - {response.text[:500]}"
+            if response.status_code not in RETRY_STATUSES:
+                break
+        if attempt + 1 < settings.max_attempts:
+            retries += 1
+            time.sleep(_retry_delay(attempt, settings, response))
+    raise UploadError(f"Chunk {index} failed: {error}")
+
+
+def upload_metrics_file(metrics_path: str, settings: UploadSettings) -> UploadReport:
+    """Upload a metrics file in chunks, resuming from its checkpoint; raises UploadError."""
+    checkpoint = Checkpoint(metrics_path, _identity(metrics_path, settings))
+    ndjson = _is_ndjson(metrics_path)
+    filename = os.path.basename(metrics_path)
+    content_type = "application/x-ndjson" if ndjson else "application/json"
+    report = UploadReport()
+    session = make_session(settings)
+    failure: Optional[BaseException] = None
+    # Chunks are built lazily; at most 2 per worker are held in memory
+    window: Deque[Tuple[int, "Future[int]", int]] = deque()
+
+    def settle(index: int, future: "Future[int]", size: int) -> None:
+        nonlocal failure
+        try:
+            # Counted here, on the submitting thread, rather than by the workers
+            retries = future.result()
+        except BaseException as exc:
+            failure = failure or exc
+            return
+        checkpoint.mark(index)
+        report.retries += retries
+        report.sent += 1
+        report.bytes_sent += size
+
+    with session, ThreadPoolExecutor(max_workers=settings.workers) as pool:
+        for index, body in enumerate(iter_chunks(metrics_path, settings.chunk_bytes)):
+            report.chunks += 1
+            if index in checkpoint.done:
+                report.resumed += 1
+                continue
+            if failure is not None:
+                break
+            window.append((index, pool.submit(_send_chunk, session, settings, index, body, filename, content_type), len(body)))
+            while len(window) >= 2 * settings.workers:
+                settle(*window.popleft())
+        while window:
+            settle(*window.popleft())
+    if failure is not None:
+        raise failure
+    checkpoint.clear()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Upload (or resume uploading) a metrics file to QALITA")
+    parser.add_argument("metrics_path", help="metrics.json (JSON array) or metrics.ndjson file")
+    args = parser.parse_args()
+    settings = UploadSettings.from_env()
+    if settings is None:
+        raise SystemExit("QALITA_AGENT_ENDPOINT and QALITA_AGENT_TOKEN are required to upload.")
+    try:
+        report = upload_metrics_file(args.metrics_path, settings)
+    except UploadError as exc:
+        raise SystemExit(f"Upload interrupted, rerun to resume: {exc}")
+    print(f"Uploaded {report.sent} chunk(s) ({report.bytes_sent} bytes), {report.resumed} already sent, {report.retries} retries")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,74 @@
 #!/usr/bin/env python3
+import glob
+import multiprocessing
 import os
-import json
+from concurrent.futures import ProcessPoolExecutor
 import click
-import requests
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
+import qalita_json
+from qalita_json import Metric
+from qalita_upload import UploadError, UploadSettings, upload_metrics_file
+import fast_expectations
+from data_loading import FORMATS, load_dataset
+from result_cache import ResultCache, cache_key, data_fingerprint, package_version
+
 try:
-    from great_expectations.dataset import PandasDataset
-except Exception:
-    PandasDataset = None  # type: ignore
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None  # type: ignore
 
 
 def build_expectations_from_suite_file(suite_path: str) -> List[Dict[str, Any]]:
     if not os.path.isfile(suite_path):
         return []
-    with open(suite_path, "r", encoding="utf-8") as f:
-        suite = json.load(f)
+    suite = qalita_json.load(suite_path)
     return suite.get("expectations", []) if isinstance(suite, dict) else []
 
 
-def run_expectations(df: pd.DataFrame, expectations: List[Dict[str, Any]]):
-    if PandasDataset is None:
-        raise RuntimeError("great_expectations PandasDataset API not available. Check your installation.")
-    gx_ds = PandasDataset(df)
+def load_pandas_dataset():
+    # Imported on first use: great_expectations takes seconds to import (in every
+    # batch worker), and suites handled by the native engine do not need it
+    try:
+        from great_expectations.dataset import PandasDataset
+    except Exception:
+        return None
+    return PandasDataset
+
+
+def run_expectations(df: pd.DataFrame, expectations: List[Dict[str, Any]], engine: str = "native"):
+    # The native engine evaluates the common expectation types column by column;
+    # the rest (or everything with engine="ge") goes through PandasDataset
+    if engine == "native":
+        native, fallback = fast_expectations.evaluate(df, expectations)
+    else:
+        native, fallback = {}, list(range(len(expectations)))
+    gx_ds = None
+    if fallback:
+        PandasDataset = load_pandas_dataset()
+        if PandasDataset is None:
+            raise RuntimeError("great_expectations PandasDataset API not available. Check your installation.")
+        gx_ds = PandasDataset(df)
     results: List[Dict[str, Any]] = []
     total = 0
     passed = 0
 
-    for exp in expectations:
+    for index, exp in enumerate(expectations):
         exp_type = exp.get("expectation_type")
         kwargs = exp.get("kwargs", {})
-        if not exp_type or not hasattr(gx_ds, exp_type):
-            continue
-        try:
-            res = getattr(gx_ds, exp_type)(**kwargs)
-            success = bool(res.get("success", False))
-        except Exception:
-            success = False
-            res = {"success": False, "exception": True}
+        if index in native:
+            success = native[index]
+        else:
+            if not exp_type or not hasattr(gx_ds, exp_type):
+                continue
+            try:
+                res = getattr(gx_ds, exp_type)(**kwargs)
+                success = bool(res.get("success", False))
+            except Exception:
+                success = False
+                res = {"success": False, "exception": True}
         results.append({
             "expectation_type": exp_type,
             "kwargs": kwargs,
@@ -52,45 +81,138 @@ def run_expectations(df: pd.DataFrame, expectations: List[Dict[str, Any]]):
     return results, score
 
 
-def write_metrics_json(metrics: List[Dict[str, Any]], out_path: str):
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(metrics, f, indent=2)
+def write_metrics_json(metrics: List[Metric], out_path: str):
+    qalita_json.dump(metrics, out_path)
+
+
+def expectation_metrics(results: List[Dict[str, Any]], score: float, scope: Dict[str, Any]) -> List[Metric]:
+    metrics: List[Metric] = []
+    # Per-expectation results
+    for r in results:
+        metrics.append(Metric(
+            key="expectation_result",
+            value={"expectation": r.get("expectation_type"), "success": bool(r.get("success"))},
+            scope=scope,
+        ))
+    # Aggregate score
+    metrics.append(Metric(key="score", value=str(score), scope=scope))
+    return metrics
+
+
+def list_batch_files(patterns: Tuple[str, ...], manifest: Optional[str]) -> List[str]:
+    """Data files matched by the glob patterns, then those listed in the manifest (one path per line)."""
+    paths: List[str] = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(pattern, recursive=True)))
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    paths.append(line if os.path.isabs(line) else os.path.join(base, line))
+    # Keep the first occurrence of each file
+    unique: Dict[str, str] = {}
+    for path in paths:
+        unique.setdefault(os.path.abspath(path), path)
+    return list(unique.values())
+
+
+# Bump when the evaluation changes, to invalidate cached results
+RESULTS_VERSION = 1
+
+
+def suite_cache_parts(expectations: List[Dict[str, Any]], data_format: str, engine: str) -> Dict[str, Any]:
+    """Everything besides the data file that determines a file's results."""
+    return {
+        "expectations": expectations,
+        "format": data_format,
+        "engine": engine,
+        "runner": RESULTS_VERSION,
+        "versions": {name: package_version(name) for name in ("great_expectations", "pandas", "pyarrow", "numpy")},
+    }
+
+
+# Set once per worker process by the pool initializer
+_batch_suite: Dict[str, Any] = {}
+
+
+def _init_batch_worker(expectations: List[Dict[str, Any]], data_format: str, engine: str, arrow_threads: int) -> None:
+    _batch_suite.update(expectations=expectations, data_format=data_format, engine=engine)
+    if pa is not None:
+        # Workers share the cores: keep pyarrow's CSV parsing from oversubscribing them
+        pa.set_cpu_count(arrow_threads)
+
+
+def validate_file(path: str) -> Dict[str, Any]:
+    """Load and validate one data file with the worker's suite; errors are reported, not raised."""
+    try:
+        df = load_dataset(path, _batch_suite["expectations"], _batch_suite["data_format"])
+        results, score = run_expectations(df, _batch_suite["expectations"], _batch_suite["engine"])
+    except Exception as exc:
+        return {"path": path, "error": f"{type(exc).__name__}: {exc}"}
+    return {"path": path, "rows": len(df), "results": results, "score": score}
+
+
+def run_batch(paths: List[str], expectations: List[Dict[str, Any]], data_format: str, engine: str, workers: int) -> List[Dict[str, Any]]:
+    """Validate the files across a process pool; outcomes are returned in the order of `paths`."""
+    workers = max(1, min(workers, len(paths)))
+    arrow_threads = max(1, (os.cpu_count() or 1) // workers)
+    initargs = (expectations, data_format, engine, arrow_threads)
+    if workers == 1:
+        _init_batch_worker(*initargs)
+        return [validate_file(path) for path in paths]
+    # The suite is sent once per worker, not once per file
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_batch_worker,
+        initargs=initargs,
+    ) as pool:
+        return list(pool.map(validate_file, paths))
 
 
 def upload_metrics(metrics_path: str) -> None:
-    endpoint = os.getenv("QALITA_AGENT_ENDPOINT")
-    token = os.getenv("QALITA_AGENT_TOKEN")
-    source_id = os.getenv("QALITA_SOURCE_ID")
-    if not endpoint or not token:
+    settings = UploadSettings.from_env()
+    if settings is None:
         click.echo("QALITA_AGENT_ENDPOINT and QALITA_AGENT_TOKEN are required to upload. Skipping upload.")
         return
-    url = endpoint.rstrip("/") + "/api/v1/metrics/upload"
-    params = {}
-    if source_id:
-        params["source_id"] = source_id
-    verify = not bool(os.getenv("SKIP_SSL_VERIFY", ""))
-    with open(metrics_path, "rb") as f:
-        r = requests.post(url, headers={"Authorization": f"Bearer {token}"}, files={"file": f}, params=params, timeout=60, verify=verify)
-    if r.status_code == 200:
-        click.echo("Uploaded metrics to QALITA.")
-    else:
-        click.echo(f"Failed to upload metrics: {r.status_code} - {r.text}")
+    try:
+        report = upload_metrics_file(metrics_path, settings)
+    except UploadError as exc:
+        raise click.ClickException(
+            f"Failed to upload metrics: {exc}. Rerun, or `python qalita_upload.py {metrics_path}`, to resume."
+        )
+    click.echo(f"Uploaded metrics to QALITA: {report.sent} chunk(s) sent, {report.resumed} already sent, {report.retries} retries.")
 
 
 @click.command()
 @click.option("--suite", "suite_name", default="retail_suite", show_default=True, help="Expectation suite name")
-@click.option("--data", "data_path", default="data/retail.csv", show_default=True, help="CSV data path")
+@click.option("--data", "data_path", default="data/retail.csv", show_default=True, help="Data file path (CSV, Parquet or Arrow IPC)")
+@click.option("--format", "data_format", type=click.Choice(["auto", *FORMATS]), default="auto", show_default=True, help="Data file format (auto: from the file extension)")
 @click.option("--suite-file", "suite_file", default="ge/expectations/retail_suite.json", show_default=True, help="Suite JSON file path")
 @click.option("--dataset-name", default=os.getenv("DATASET_NAME", "retail"), show_default=True, help="Logical dataset name")
 @click.option("--env", "dataset_env", default=os.getenv("DATASET_ENV", "dev"), show_default=True, help="Environment tag")
+@click.option("--engine", type=click.Choice(["native", "ge"]), default="native", show_default=True, help="native: vectorized evaluation of common expectations, GE for the rest; ge: Great Expectations only")
+@click.option("--batch", "batch_patterns", multiple=True, help="Batch mode: glob of data files to validate (repeatable, ** supported); replaces --data")
+@click.option("--manifest", "manifest_path", default=None, help="Batch mode: file listing data files, one per line (relative to the manifest)")
+@click.option("--workers", default=os.cpu_count() or 1, show_default=True, type=int, help="Batch mode: worker processes")
+@click.option("--force", is_flag=True, help="Revalidate every file, ignoring cached results")
+@click.option("--cache-size", default=1000, show_default=True, type=int, help="Max cached results in artifacts/cache (0: no cache)")
+@click.option("--cache-content-hash", is_flag=True, help="Identify data files by a hash of their content instead of path, size and mtime")
 @click.option("--no-upload", is_flag=True, help="Do not upload metrics to QALITA")
-def main(suite_name: str, data_path: str, suite_file: str, dataset_name: str, dataset_env: str, no_upload: bool):
+def main(suite_name: str, data_path: str, data_format: str, suite_file: str, dataset_name: str, dataset_env: str, engine: str, batch_patterns: Tuple[str, ...], manifest_path: Optional[str], workers: int, force: bool, cache_size: int, cache_content_hash: bool, no_upload: bool):
     load_dotenv(override=False)
 
-    if not os.path.isfile(data_path):
+    batch = bool(batch_patterns or manifest_path)
+    if batch:
+        paths = list_batch_files(batch_patterns, manifest_path)
+        if not paths:
+            raise click.UsageError("No data files matched --batch/--manifest")
+    elif not os.path.isfile(data_path):
         raise FileNotFoundError(f"Data file not found: {data_path}")
-
-    df = pd.read_csv(data_path)
+    else:
+        paths = [data_path]
 
     expectations = build_expectations_from_suite_file(suite_file)
     if not expectations:
@@ -103,22 +225,60 @@ def main(suite_name: str, data_path: str, suite_file: str, dataset_name: str, da
             {"expectation_type": "expect_column_values_to_be_unique", "kwargs": {"column": "id"}},
         ]
 
-    results, score = run_expectations(df, expectations)
+    # Cached results of unchanged files are reused without loading them
+    cache = ResultCache(os.path.join("artifacts", "cache"), cache_size) if cache_size > 0 else None
+    outcomes: Dict[str, Dict[str, Any]] = {}
+    keys: Dict[str, str] = {}
+    if cache is not None:
+        suite_parts = suite_cache_parts(expectations, data_format, engine)
+        for path in paths:
+            try:
+                keys[path] = cache_key(data=data_fingerprint(path, cache_content_hash), **suite_parts)
+            except OSError:
+                continue  # Reported by the validation
+            cached = None if force else cache.get(keys[path])
+            if cached is not None:
+                outcomes[path] = {"path": path, **cached}
+    pending = [path for path in paths if path not in outcomes]
 
-    metrics: List[Dict[str, Any]] = []
-    # Per-expectation results
-    for r in results:
-        metrics.append({
-            "key": "expectation_result",
-            "value": {"expectation": r.get("expectation_type"), "success": bool(r.get("success"))},
-            "scope": {"perimeter": "dataset", "value": dataset_name, "env": dataset_env, "suite": suite_name},
-        })
-    # Aggregate score
-    metrics.append({
-        "key": "score",
-        "value": str(score),
-        "scope": {"perimeter": "dataset", "value": dataset_name, "env": dataset_env, "suite": suite_name},
-    })
+    if batch:
+        validated = run_batch(pending, expectations, data_format, engine, workers) if pending else []
+    elif pending:
+        # Only the columns the suite references, typed from the expectations
+        df = load_dataset(data_path, expectations, data_format)
+        results, score = run_expectations(df, expectations, engine)
+        validated = [{"path": data_path, "rows": len(df), "results": results, "score": score}]
+    else:
+        validated = []
+    for outcome in validated:
+        outcomes[outcome["path"]] = outcome
+        if cache is not None and "error" not in outcome and outcome["path"] in keys:
+            cache.put(keys[outcome["path"]], {k: v for k, v in outcome.items() if k != "path"})
+    if cache is not None:
+        cache.prune()
+        click.echo(f"Result cache: {len(paths) - len(pending)} hit(s), {len(pending)} file(s) to validate")
+
+    scope = {"perimeter": "dataset", "value": dataset_name, "env": dataset_env, "suite": suite_name}
+    if batch:
+        metrics: List[Metric] = []
+        total = passed = 0
+        for path in paths:
+            outcome = outcomes[path]
+            file_scope = {**scope, "file": path}
+            if "error" in outcome:
+                click.echo(f"Failed to validate {path}: {outcome['error']}")
+                metrics.append(Metric(key="error", value=outcome["error"], scope=file_scope))
+                continue
+            metrics.extend(expectation_metrics(outcome["results"], outcome["score"], file_scope))
+            total += len(outcome["results"])
+            passed += sum(1 for r in outcome["results"] if r.get("success"))
+        # Aggregate score over every expectation of every validated file
+        metrics.append(Metric(key="score", value=str(1.0 if total == 0 else round(passed / total, 4)), scope=scope))
+        failed = sum(1 for path in paths if "error" in outcomes[path])
+        click.echo(f"Validated {len(paths) - failed}/{len(paths)} files")
+    else:
+        outcome = outcomes[data_path]
+        metrics = expectation_metrics(outcome["results"], outcome["score"], scope)
 
     os.makedirs("artifacts", exist_ok=True)
     metrics_path = os.path.join("artifacts", "metrics.json")
@@ -131,4 +291,3 @@ def main(suite_name: str, data_path: str, suite_file: str, dataset_name: str, da
 
 if __name__ == "__main__":
     main()
-\"EOF\"
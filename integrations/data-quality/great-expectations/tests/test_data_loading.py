@@ -0,0 +1,69 @@
+"""load_dataset must validate like the baseline pd.read_csv load."""
+
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_loading  # noqa: E402
+import fast_expectations  # noqa: E402
+from data_loading import load_dataset  # noqa: E402
+
+RETAIL_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "retail.csv")
+
+MIXED_CSV = """id,date,time,created_at,flag,code,amount,note
+1,2025-01-01,12:30:00,2025-01-01 12:30:00,True,10,1.5,a
+2,2025-01-02,13:00:00,2025-01-02T13:00:00,False,20,,b
+3,,,,True,30,2.5,
+4,2025-01-04,14:15:00,2025-01-04 14:15:00,False,A40,3.0,d
+"""
+
+
+def _column_expectations(df: pd.DataFrame):
+    # Each column checked against its own baseline values: any retyping shows up
+    expectations = []
+    for column in df.columns:
+        values = [v for v in df[column].tolist() if not pd.isna(v)]
+        expectations += [
+            {"expectation_type": "expect_column_values_to_be_in_set", "kwargs": {"column": column, "value_set": values}},
+            {"expectation_type": "expect_column_values_to_not_be_null", "kwargs": {"column": column}},
+            {"expectation_type": "expect_column_values_to_be_unique", "kwargs": {"column": column}},
+        ]
+    return expectations
+
+
+def _assert_same_outcomes(path: str, expectations) -> None:
+    baseline = fast_expectations.evaluate(pd.read_csv(path), expectations)
+    loaded = fast_expectations.evaluate(load_dataset(path, expectations), expectations)
+    assert loaded == baseline
+
+
+def test_retail_matches_read_csv():
+    _assert_same_outcomes(RETAIL_CSV, _column_expectations(pd.read_csv(RETAIL_CSV)))
+
+
+def test_retail_suite_matches_read_csv():
+    suite = os.path.join(os.path.dirname(RETAIL_CSV), "..", "ge", "expectations", "retail_suite.json")
+    with open(suite) as f:
+        expectations = json.load(f)["expectations"]
+    _assert_same_outcomes(RETAIL_CSV, expectations)
+
+
+@pytest.mark.parametrize("block_size", [data_loading.CSV_BLOCK_SIZE, 64])
+def test_unhinted_columns_match_read_csv(tmp_path, monkeypatch, block_size):
+    # A small block makes `code` change type after the first block
+    monkeypatch.setattr(data_loading, "CSV_BLOCK_SIZE", block_size)
+    path = tmp_path / "mixed.csv"
+    path.write_text(MIXED_CSV)
+    baseline = pd.read_csv(path)
+    _assert_same_outcomes(str(path), _column_expectations(baseline))
+
+    loaded = load_dataset(str(path), _column_expectations(baseline))
+    for column in ("date", "time", "created_at", "code", "note"):
+        assert not pd.api.types.is_numeric_dtype(loaded[column]) and not pd.api.types.is_datetime64_any_dtype(loaded[column])
+    assert pd.api.types.is_bool_dtype(loaded["flag"]) == pd.api.types.is_bool_dtype(baseline["flag"])
+    assert pd.api.types.is_float_dtype(loaded["amount"]) and pd.api.types.is_integer_dtype(loaded["id"])
@@ -0,0 +1,153 @@
+"""
+Fast JSON serialization for QALITA integration artifacts
+
+Encodes and decodes with msgspec or orjson when one is installed, and falls
+back to the standard library otherwise. Force a backend with
+QALITA_JSON_BACKEND=msgspec|orjson|json (default: auto, first available).
+
+The records exchanged with QALITA (metrics, schemas, recommendations) are
+msgspec Structs when msgspec is available and dataclasses otherwise; both
+expose the same attributes and encode to the same JSON.
+
+This file is shared verbatim by the integration examples that need it.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import os
+from typing import Any, Dict, Optional
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None  # type: ignore
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore
+
+
+BACKENDS = tuple(name for name, module in (("msgspec", msgspec), ("orjson", orjson), ("json", json)) if module is not None)
+
+
+def _default_backend() -> str:
+    requested = os.getenv("QALITA_JSON_BACKEND", "auto").strip().lower()
+    if requested in ("", "auto"):
+        return BACKENDS[0]
+    if requested not in BACKENDS:
+        raise RuntimeError(f"QALITA_JSON_BACKEND={requested} is not available (installed: {', '.join(BACKENDS)})")
+    return requested
+
+
+BACKEND = _default_backend()
+
+
+if msgspec is not None:
+
+    class Metric(msgspec.Struct):
+        key: str
+        value: Any
+        scope: Dict[str, Any] = msgspec.field(default_factory=dict)
+
+    class SchemaRecord(msgspec.Struct):
+        key: str
+        value: str
+        scope: Dict[str, Any] = msgspec.field(default_factory=dict)
+
+    class Recommendation(msgspec.Struct):
+        content: str
+        type: str
+        scope: Dict[str, Any]
+        level: str
+
+else:
+
+    @dataclasses.dataclass
+    class Metric:  # type: ignore[no-redef]
+        key: str
+        value: Any
+        scope: Dict[str, Any] = dataclasses.field(default_factory=dict)
+
+    @dataclasses.dataclass
+    class SchemaRecord:  # type: ignore[no-redef]
+        key: str
+        value: str
+        scope: Dict[str, Any] = dataclasses.field(default_factory=dict)
+
+    @dataclasses.dataclass
+    class Recommendation:  # type: ignore[no-redef]
+        content: str
+        type: str
+        scope: Dict[str, Any]
+        level: str
+
+
+def to_builtins(obj: Any) -> Any:
+    """Convert records (and containers of records) to plain dicts/lists."""
+    if msgspec is not None:
+        return msgspec.to_builtins(obj, enc_hook=str)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {f.name: to_builtins(getattr(obj, f.name)) for f in dataclasses.fields(obj)}
+    if isinstance(obj, dict):
+        return {k: to_builtins(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_builtins(v) for v in obj]
+    return obj
+
+
+def _fallback_default(obj: Any) -> Any:
+    # Records and anything else the backend does not know (Decimal, numpy scalars, ...)
+    if (msgspec is not None and isinstance(obj, msgspec.Struct)) or (
+        dataclasses.is_dataclass(obj) and not isinstance(obj, type)
+    ):
+        return to_builtins(obj)
+    return str(obj)
+
+
+def dumps(obj: Any, pretty: bool = False, sort_keys: bool = False, backend: Optional[str] = None) -> bytes:
+    """Encode `obj` to UTF-8 JSON bytes, compact unless `pretty`."""
+    backend = backend or BACKEND
+    if backend == "msgspec":
+        data = msgspec.json.encode(obj, enc_hook=str, order="sorted" if sort_keys else None)
+        return msgspec.json.format(data, indent=2) if pretty else data
+    if backend == "orjson":
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            # Route dataclasses through the default hook so their fields get sorted too
+            option |= orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+        return orjson.dumps(obj, default=_fallback_default, option=option)
+    return json.dumps(
+        obj,
+        default=_fallback_default,
+        sort_keys=sort_keys,
+        indent=2 if pretty else None,
+        separators=None if pretty else (",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def loads(data: Any, type: Any = None, backend: Optional[str] = None) -> Any:
+    """Decode JSON bytes/str. With msgspec, `type` decodes straight into records."""
+    backend = backend or BACKEND
+    if type is not None and msgspec is not None:
+        return msgspec.json.decode(data, type=type)
+    if backend == "msgspec":
+        return msgspec.json.decode(data)
+    if backend == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump(obj: Any, path: str, pretty: bool = False) -> None:
+    with open(path, "wb") as f:
+        f.write(dumps(obj, pretty=pretty))
+
+
+def load(path: str, type: Any = None) -> Any:
+    with open(path, "rb") as f:
+        return loads(f.read(), type=type)
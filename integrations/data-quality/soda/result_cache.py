@@ -0,0 +1,116 @@
+"""
+Content-addressed cache of validation results
+
+A validation result depends only on the data file, the suite/checks and the
+library versions. Results are stored as JSON under a key hashing those
+inputs, so a rerun over unchanged files reuses them without loading the data.
+
+Data files are fingerprinted by path, size and modification time (fast), or
+by a hash of their content (`content=True`: a renamed or re-written but
+identical file still hits). Entries are files under `<directory>/<k[:2]>/`;
+reads refresh their modification time, and the least recently used entries
+are evicted above `max_entries`.
+
+This module is shared by the GE and Soda examples (one copy per integration).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from importlib import metadata
+from typing import Any, Dict, Optional
+
+import qalita_json
+
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "not installed"
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def data_fingerprint(path: str, content: bool = False) -> Dict[str, Any]:
+    if content:
+        return {"blake2b": file_digest(path)}
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def cache_key(**parts: Any) -> str:
+    """Hash of the canonical JSON encoding of `parts`."""
+    return hashlib.blake2b(qalita_json.dumps(parts, sort_keys=True), digest_size=20).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory: str, max_entries: int = 1000) -> None:
+        self.directory = directory
+        self.max_entries = max(1, max_entries)
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            value = qalita_json.load(path)
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+        try:
+            # Marks the entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        self.stats["hits"] += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside then renamed, so concurrent runs never read a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(qalita_json.dumps(value))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def prune(self) -> int:
+        """Evict the least recently used entries above max_entries; returns how many were removed."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        entries.append((os.stat(path).st_mtime_ns, path))
+                    except FileNotFoundError:
+                        continue
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return 0
+        entries.sort()
+        for _, path in entries[:excess]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self.stats["evicted"] += excess
+        return excess
@@ -1,10 +1,13 @@
 import argparse
-import json
 import os
 from pathlib import Path
 
 import pandas as pd
-from soda.scan import Scan
+
+import qalita_json
+from qalita_json import Metric, Recommendation
+from qalita_upload import UploadError, UploadSettings, upload_metrics_file
+from result_cache import ResultCache, cache_key, data_fingerprint, file_digest, package_version
 
 
 def ensure_dir(path: Path) -> None:
@@ -17,12 +20,12 @@ def build_recommendations(checks: list, dataset_label: str) -> list:
     passed = sum(1 for c in checks if c.get("outcome") == "pass")
     score = passed / total if total > 0 else 0.0
     if score < 1.0:
-        recs.append({
-            "content": f"Dataset '{dataset_label}' passed {passed}/{total} checks ({round(score*100,2)}%).",
-            "type": "Checks Summary",
-            "scope": {"perimeter": "dataset", "value": dataset_label},
-            "level": "medium" if score >= 0.8 else "high",
-        })
+        recs.append(Recommendation(
+            content=f"Dataset '{dataset_label}' passed {passed}/{total} checks ({round(score*100,2)}%).",
+            type="Checks Summary",
+            scope={"perimeter": "dataset", "value": dataset_label},
+            level="medium" if score >= 0.8 else "high",
+        ))
     for c in checks:
         if c.get("outcome") != "pass":
             col = c.get("column")
@@ -33,20 +36,76 @@ def build_recommendations(checks: list, dataset_label: str) -> list:
                     "value": col,
                     "parent_scope": {"perimeter": "dataset", "value": dataset_label},
                 }
-            recs.append({
-                "content": c.get("definition") or c.get("name") or "Check failed",
-                "type": c.get("name") or "Check Failed",
-                "scope": scope,
-                "level": "high",
-            })
+            recs.append(Recommendation(
+                content=c.get("definition") or c.get("name") or "Check failed",
+                type=c.get("name") or "Check Failed",
+                scope=scope,
+                level="high",
+            ))
     return recs
 
 
+def run_soda_scan(data_path: Path, checks_path: Path, dataset_label: str) -> dict:
+    from soda.scan import Scan
+
+    df = pd.read_csv(data_path)
+
+    scan = Scan()
+    data_source_name = dataset_label
+    scan.set_data_source_name(data_source_name)
+    scan.add_pandas_dataframe(
+        data_source_name=data_source_name,
+        dataset_name=dataset_label,
+        pandas_df=df,
+    )
+    scan.add_sodacl_yaml_files(str(checks_path))
+    scan.execute()
+    return scan.get_scan_results()
+
+
+def is_cacheable(results: dict) -> bool:
+    """Whether the scan went through: no errors, and at least one check evaluated."""
+    if results.get("hasErrors"):
+        return False
+    return any(c.get("outcome") for c in results.get("checks") or [])
+
+
+def upload_metrics(metrics_path: str) -> None:
+    settings = UploadSettings.from_env()
+    if settings is None:
+        print("QALITA_AGENT_ENDPOINT and QALITA_AGENT_TOKEN are required to upload. Skipping upload.")
+        return
+    try:
+        report = upload_metrics_file(metrics_path, settings)
+    except UploadError as exc:
+        raise SystemExit(f"Failed to upload metrics: {exc}. Rerun, or `python qalita_upload.py {metrics_path}`, to resume.")
+    print(f"Uploaded metrics to QALITA: {report.sent} chunk(s) sent, {report.resumed} already sent, {report.retries} retries.")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Run Soda scan on a CSV and emit artifacts")
     parser.add_argument("--data", default="data/retail.csv", help="Path to CSV data file")
     parser.add_argument("--checks", default="checks/checks.yaml", help="Path to SodaCL checks file")
     parser.add_argument("--artifacts", default="artifacts", help="Directory to write artifacts")
+    parser.add_argument(
+        "--mode",
+        choices=["scan", "chunked"],
+        default="scan",
+        help="scan: load the CSV and run Soda; chunked: evaluate supported checks chunk by chunk (large files)",
+    )
+    parser.add_argument("--chunk-rows", type=int, default=500_000, help="Rows per chunk in chunked mode")
+    parser.add_argument("--force", action="store_true", help="Rescan even if results for the same inputs are cached")
+    parser.add_argument("--cache-size", type=int, default=1000, help="Max cached results in <artifacts>/cache (0: no cache)")
+    parser.add_argument(
+        "--cache-content-hash",
+        action="store_true",
+        help="Identify the data file by a hash of its content instead of path, size and mtime",
+    )
+    parser.add_argument(
+        "--upload",
+        action="store_true",
+        help="Upload metrics.json to QALITA (QALITA_AGENT_ENDPOINT, QALITA_AGENT_TOKEN, QALITA_SOURCE_ID)",
+    )
     args = parser.parse_args()
 
     data_path = Path(args.data)
@@ -55,21 +114,36 @@ def main() -> None:
 
     ensure_dir(artifacts_dir)
 
-    df = pd.read_csv(data_path)
     dataset_label = data_path.stem
 
-    scan = Scan()
-    data_source_name = dataset_label
-    scan.set_data_source_name(data_source_name)
-    scan.add_pandas_dataframe(
-        data_source_name=data_source_name,
-        dataset_name=dataset_label,
-        pandas_df=df,
-    )
-    scan.add_sodacl_yaml_files(str(checks_path))
-    scan.execute()
-
-    results = scan.get_scan_results()
+    # Results of a scan with the same data, checks and versions are reused without reading the data
+    cache = ResultCache(str(artifacts_dir / "cache"), args.cache_size) if args.cache_size > 0 else None
+    key = None
+    results = None
+    if cache is not None:
+        key = cache_key(
+            data=data_fingerprint(str(data_path), args.cache_content_hash),
+            checks=file_digest(str(checks_path)),
+            dataset=dataset_label,
+            mode=args.mode,
+            chunk_rows=args.chunk_rows if args.mode == "chunked" else None,
+            versions={name: package_version(name) for name in ("soda-core", "soda-core-pandas-dask", "pandas", "pyarrow", "PyYAML")},
+        )
+        results = None if args.force else cache.get(key)
+
+    cached = results is not None
+    if cached:
+        print("Reusing cached scan results")
+    elif args.mode == "chunked":
+        from chunked_scan import run_chunked_scan
+
+        results = run_chunked_scan(data_path, checks_path, dataset_label, args.chunk_rows)
+    else:
+        results = run_soda_scan(data_path, checks_path, dataset_label)
+    # A scan that could not load the data or evaluate its checks is not reused
+    if cache is not None and not cached and is_cacheable(results):
+        cache.put(key, results)
+        cache.prune()
     checks = results.get("checks", [])
 
     total_checks = len(checks)
@@ -77,23 +151,24 @@ def main() -> None:
     score = round(passed_checks / total_checks, 2) if total_checks > 0 else 0.0
 
     metrics = [
-        {"key": "score", "value": score, "scope": {"perimeter": "dataset", "value": dataset_label}},
-        {"key": "check_passed", "value": passed_checks, "scope": {"perimeter": "dataset", "value": dataset_label}},
-        {"key": "check_failed", "value": total_checks - passed_checks, "scope": {"perimeter": "dataset", "value": dataset_label}},
+        Metric(key="score", value=score, scope={"perimeter": "dataset", "value": dataset_label}),
+        Metric(key="check_passed", value=passed_checks, scope={"perimeter": "dataset", "value": dataset_label}),
+        Metric(key="check_failed", value=total_checks - passed_checks, scope={"perimeter": "dataset", "value": dataset_label}),
     ]
 
-    with open(artifacts_dir / "metrics.json", "w", encoding="utf-8") as f:
-        json.dump(metrics, f, indent=2)
+    qalita_json.dump(metrics, str(artifacts_dir / "metrics.json"))
 
     recommendations = build_recommendations(checks, dataset_label)
-    with open(artifacts_dir / "recommendations.json", "w", encoding="utf-8") as f:
-        json.dump(recommendations, f, indent=2)
+    qalita_json.dump(recommendations, str(artifacts_dir / "recommendations.json"))
 
-    with open(artifacts_dir / "soda_results.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2)
+    # Raw results are for troubleshooting; keep them readable
+    qalita_json.dump(results, str(artifacts_dir / "soda_results.json"), pretty=True)
 
     print(f"Wrote artifacts to {artifacts_dir}")
 
+    if args.upload:
+        upload_metrics(str(artifacts_dir / "metrics.json"))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,46 @@
+"""run_chunked_scan must give the same metrics whatever the chunking and column types."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chunked_scan  # noqa: E402
+from chunked_scan import run_chunked_scan  # noqa: E402
+
+CHECKS = """checks for data:
+  - row_count > 0
+  - missing_count(amount) = 0
+  - duplicate_count(id) = 0
+  - min(amount) > 0
+"""
+
+
+def _values(results):
+    return {check["name"]: check["diagnostics"]["value"] for check in results["checks"]}
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "pandas"])
+def test_min_column_changing_type_after_first_block(tmp_path, monkeypatch, engine):
+    if engine == "pandas":
+        monkeypatch.setattr(chunked_scan, "pa_csv", None)
+    elif chunked_scan.pa_csv is None:
+        pytest.skip("pyarrow not installed")
+    # Integers for well over the first block, then a decimal and a missing value
+    rows = [f"{n},{n + 1}" for n in range(200_000)] + ["200000,0.5", "200001,"]
+    data = tmp_path / "data.csv"
+    data.write_text("id,amount\n" + "\n".join(rows) + "\n")
+    checks = tmp_path / "checks.yaml"
+    checks.write_text(CHECKS)
+
+    results = run_chunked_scan(data, checks, "data", chunk_rows=10_000)
+
+    assert results["chunks"] > 1
+    assert _values(results) == {
+        "row_count > 0": 200_002,
+        "missing_count(amount) = 0": 1,
+        "duplicate_count(id) = 0": 0,
+        "min(amount) > 0": 0.5,
+    }
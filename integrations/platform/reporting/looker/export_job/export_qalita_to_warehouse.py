@@ -1,11 +1,21 @@
+import argparse
+import io
+import json
 import os
 import time
 import math
 import logging
-from datetime import datetime, timezone
+import multiprocessing
+from collections import deque
+from contextlib import closing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable
 
 import requests
-from sqlalchemy import create_engine, text
+from requests.adapters import HTTPAdapter
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import Engine
 from dotenv import load_dotenv
 
@@ -21,13 +31,19 @@ def get_env(name: str, default: str | None = None, required: bool = False) -> st
     return value
 
 
-def make_engine() -> Engine:
+def make_engine(pool_size: int = 5) -> Engine:
+    """Engine whose pool holds one connection per concurrently exported entity."""
     url = get_env("WAREHOUSE_URL", required=True)
-    engine = create_engine(url, pool_pre_ping=True, future=True)
+    engine = create_engine(url, pool_pre_ping=True, pool_size=pool_size, future=True)
     schema = os.getenv("WAREHOUSE_SCHEMA")
     if schema:
-        with engine.connect() as conn:
-            conn.execute(text(f"set search_path to {schema}"))
+        # Applied to every pooled connection, not only the first one
+        @event.listens_for(engine, "connect")
+        def _set_search_path(dbapi_connection, _record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"set search_path to {schema}")
+            cursor.close()
+
     return engine
 
 
@@ -36,86 +52,260 @@ def get_headers() -> dict:
     return {"Authorization": f"Bearer {token}", "Accept": "application/json"}
 
 
-def paginate(endpoint: str, params: dict, batch_size: int):
-    page = 0
-    while True:
-        page_params = params | {"offset": page * batch_size, "limit": batch_size}
-        resp = requests.get(endpoint, headers=get_headers(), params=page_params, timeout=60)
-        resp.raise_for_status()
-        items = resp.json() or []
-        if not items:
-            break
-        yield items
-        if len(items) < batch_size:
-            break
-        page += 1
+def make_session(pool_size: int) -> requests.Session:
+    """Pooled HTTP session carrying the auth headers, shared by all page fetches."""
+    session = requests.Session()
+    session.headers.update(get_headers())
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_page(session: requests.Session, endpoint: str, params: dict, offset: int, limit: int) -> list[dict]:
+    page_params = params | {"offset": offset, "limit": limit}
+    resp = session.get(endpoint, params=page_params, timeout=60)
+    resp.raise_for_status()
+    return resp.json() or []
+
+
+def paginate(session: requests.Session, endpoint: str, params: dict, batch_size: int, window: int = 4):
+    """Yield pages in API order while up to `window` next pages are fetched in the background.
+
+    The caller's warehouse writes for page N overlap with the HTTP fetches of
+    pages N+1..N+window. Breaking out of the loop (early stop) cancels the
+    prefetches that have not started yet.
+    """
+    window = max(1, window)
+    pool = ThreadPoolExecutor(max_workers=window, thread_name_prefix="qalita-fetch")
+    pending: deque[Future] = deque()
+    next_page = 0
+
+    def prefetch() -> None:
+        nonlocal next_page
+        pending.append(pool.submit(fetch_page, session, endpoint, params, next_page * batch_size, batch_size))
+        next_page += 1
+
+    try:
+        for _ in range(window):
+            prefetch()
+        while pending:
+            items = pending.popleft().result()
+            if not items:
+                break
+            yield items
+            if len(items) < batch_size:
+                break
+            prefetch()
+    finally:
+        # Pages past the end or past an early stop are not needed; only in-flight ones are awaited
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+_copy_fallback_warned = False
 
 
-def upsert_metrics(engine: Engine, rows: list[dict]):
+def _to_json(value) -> str | None:
+    # jsonb columns are bound as JSON text; drivers do not adapt dicts on their own
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def use_copy(engine: Engine) -> bool:
+    """Whether batches go through the COPY bulk loader (WAREHOUSE_LOAD_MODE=copy).
+
+    COPY needs Postgres through psycopg2 or psycopg 3; other warehouses keep
+    the row-by-row upsert.
+    """
+    global _copy_fallback_warned
+    if (get_env("WAREHOUSE_LOAD_MODE", "upsert") or "upsert").lower() != "copy":
+        return False
+    if engine.dialect.name == "postgresql" and engine.dialect.driver in ("psycopg2", "psycopg"):
+        return True
+    if not _copy_fallback_warned:
+        logger.warning(
+            "WAREHOUSE_LOAD_MODE=copy needs Postgres with psycopg2/psycopg (got %s+%s); using upserts",
+            engine.dialect.name,
+            engine.dialect.driver,
+        )
+        _copy_fallback_warned = True
+    return False
+
+
+def _copy_text(value) -> str:
+    # COPY text format: \N is null; backslash, tab and newlines must be escaped
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_upsert(
+    engine: Engine,
+    table: str,
+    columns: tuple[str, ...],
+    rows: list[dict],
+    conflict: tuple[str, ...] = ("id",),
+):
+    """Stream rows into a temp table with COPY FROM STDIN, then merge with one insert ... on conflict."""
     if not rows:
         return
-    sql = text(
-        """
-        insert into qalita_metrics (id, partner_id, created_at, updated_at, key, value,
-                                    source_id, source_version_id, pack_id, pack_version_id, scope)
-        values (:id, :partner_id, :created_at, :updated_at, :key, :value,
-                :source_id, :source_version_id, :pack_id, :pack_version_id, cast(:scope as jsonb))
-        on conflict (id) do update set
-          partner_id = excluded.partner_id,
-          created_at = excluded.created_at,
-          updated_at = excluded.updated_at,
-          key = excluded.key,
-          value = excluded.value,
-          source_id = excluded.source_id,
-          source_version_id = excluded.source_version_id,
-          pack_id = excluded.pack_id,
-          pack_version_id = excluded.pack_version_id,
-          scope = excluded.scope
-        """
-    )
+    staging = f"_staging_{table}"
+    col_list = ", ".join(columns)
+    keys = ", ".join(conflict)
+    updates = ",\n          ".join(f"{c} = excluded.{c}" for c in columns if c not in conflict)
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_text(row.get(c)) for c in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+
     with engine.begin() as conn:
-        conn.execute(sql, rows)
+        conn.exec_driver_sql(f"create temp table {staging} (like {table}) on commit drop")
+        copy_sql = f"copy {staging} ({col_list}) from stdin"
+        # Raw DBAPI cursor: closed here, before the connection goes back to the pool
+        with closing(conn.connection.cursor()) as cursor:
+            if hasattr(cursor, "copy_expert"):
+                # psycopg2
+                cursor.copy_expert(copy_sql, buffer)
+            else:
+                # psycopg 3
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+        # distinct on: a page may repeat an id, and on conflict cannot touch a row twice
+        conn.exec_driver_sql(
+            f"""
+            insert into {table} ({col_list})
+            select distinct on ({keys}) {col_list} from {staging}
+            order by {keys}, updated_at desc
+            on conflict ({keys}) do update set
+              {updates}
+            """
+        )
+
+
+_known_partitions: set[str] = set()
+
+
+def _month_start(value: datetime) -> date:
+    return value.astimezone(timezone.utc).date().replace(day=1)
+
+
+def ensure_partitions(engine: Engine, table: str, column: str, rows: list[dict]):
+    """Create the monthly range partitions of `table` that `rows` fall into.
+
+    No-op for Postgres tables that are not partitioned and for other
+    warehouses. This does not make a table created with an earlier
+    `schema.sql` usable: the upsert targets (id, created_at) and writes the
+    typed value columns, so `warehouse/migrations/001_typed_partitioned_metrics.sql`
+    must be applied first.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    months = {_month_start(value) for value in map(_parse_iso8601, (row.get(column) for row in rows)) if value}
+    missing = {month: f"{table}_{month:%Y_%m}" for month in months if f"{table}_{month:%Y_%m}" not in _known_partitions}
+    if not missing:
+        return
+    with engine.begin() as conn:
+        partitioned = conn.execute(
+            text("select exists (select 1 from pg_partitioned_table where partrelid = to_regclass(:table))"),
+            {"table": table},
+        ).scalar()
+        if partitioned:
+            # Shard processes may create the same partition at the same time
+            conn.execute(text("select pg_advisory_xact_lock(hashtext(:table))"), {"table": table})
+            for month, name in sorted(missing.items()):
+                upper = (month + timedelta(days=32)).replace(day=1)
+                conn.exec_driver_sql(
+                    f"create table if not exists {name} partition of {table} "
+                    f"for values from ('{month.isoformat()} 00:00:00+00') to ('{upper.isoformat()} 00:00:00+00')"
+                )
+    _known_partitions.update(missing.values())
 
 
-def upsert_issues(engine: Engine, rows: list[dict]):
+def upsert_rows(engine: Engine, spec: "EntitySpec", rows: list[dict]):
+    """Write a batch of rows for `spec`, by COPY or by per-row upserts (see use_copy)."""
     if not rows:
         return
+    if spec.partition_by:
+        ensure_partitions(engine, spec.table, spec.partition_by, rows)
+    if use_copy(engine):
+        copy_upsert(engine, spec.table, spec.columns, rows, spec.conflict)
+        return
+    values = ", ".join(f"cast(:{c} as jsonb)" if c in spec.json_columns else f":{c}" for c in spec.columns)
+    updates = ",\n          ".join(f"{c} = excluded.{c}" for c in spec.columns if c not in spec.conflict)
     sql = text(
-        """
-        insert into qalita_issues (id, partner_id, created_at, updated_at, title, description, status,
-                                   url, chat_url, source_id, assignee, scope, due_date,
-                                   author_id, closed_at, updated_by, closed_by)
-        values (:id, :partner_id, :created_at, :updated_at, :title, :description, :status,
-                :url, :chat_url, :source_id, :assignee, cast(:scope as jsonb), :due_date,
-                :author_id, :closed_at, :updated_by, :closed_by)
-        on conflict (id) do update set
-          partner_id = excluded.partner_id,
-          created_at = excluded.created_at,
-          updated_at = excluded.updated_at,
-          title = excluded.title,
-          description = excluded.description,
-          status = excluded.status,
-          url = excluded.url,
-          chat_url = excluded.chat_url,
-          source_id = excluded.source_id,
-          assignee = excluded.assignee,
-          scope = excluded.scope,
-          due_date = excluded.due_date,
-          author_id = excluded.author_id,
-          closed_at = excluded.closed_at,
-          updated_by = excluded.updated_by,
-          closed_by = excluded.closed_by
+        f"""
+        insert into {spec.table} ({", ".join(spec.columns)})
+        values ({values})
+        on conflict ({", ".join(spec.conflict)}) do update set
+          {updates}
         """
     )
     with engine.begin() as conn:
         conn.execute(sql, rows)
 
 
-def get_watermark(engine: Engine, table: str) -> datetime | None:
-    sql = text(f"select max(created_at) from {table}")
+STATE_TABLE_DDL = """
+create table if not exists qalita_export_state (
+    entity text primary key,
+    cursor_updated_at timestamptz,
+    cursor_id bigint,
+    synced_at timestamptz not null
+)
+"""
+
+
+def ensure_state_table(engine: Engine):
+    with engine.begin() as conn:
+        conn.execute(text(STATE_TABLE_DDL))
+
+
+def load_cursor(engine: Engine, entity: str, table: str, where: dict | None = None) -> tuple[datetime, int] | None:
+    """Last exported (updated_at, id) for an entity (or one of its shards).
+
+    Without saved state (first run after an upgrade), the cursor is seeded from
+    the newest row already in the table matching `where`.
+    """
+    where = where or {}
+    conditions = " and ".join(f"{column} = :{column}" for column in where) or "true"
     with engine.connect() as conn:
-        result = conn.execute(sql).scalar()
-        return result
+        row = conn.execute(
+            text("select cursor_updated_at, cursor_id from qalita_export_state where entity = :entity"),
+            {"entity": entity},
+        ).first()
+        if row is None or row[0] is None:
+            row = conn.execute(
+                text(f"select updated_at, id from {table} where {conditions} order by updated_at desc, id desc limit 1"),
+                where,
+            ).first()
+    if row is None or row[0] is None:
+        return None
+    return row[0], int(row[1])
+
+
+def save_cursor(engine: Engine, entity: str, cursor: tuple[datetime, int]):
+    sql = text(
+        """
+        insert into qalita_export_state (entity, cursor_updated_at, cursor_id, synced_at)
+        values (:entity, :updated_at, :id, :synced_at)
+        on conflict (entity) do update set
+          cursor_updated_at = excluded.cursor_updated_at,
+          cursor_id = excluded.cursor_id,
+          synced_at = excluded.synced_at
+        """
+    )
+    with engine.begin() as conn:
+        conn.execute(
+            sql,
+            {"entity": entity, "updated_at": cursor[0], "id": cursor[1], "synced_at": datetime.now(timezone.utc)},
+        )
 
 
 def _parse_iso8601(dt_str: str | None) -> datetime | None:
@@ -127,90 +317,336 @@ def _parse_iso8601(dt_str: str | None) -> datetime | None:
         return None
 
 
-def export_metrics(engine: Engine, api_url: str, batch_size: int):
-    wm = get_watermark(engine, "qalita_metrics")
-    endpoint = f"{api_url}/api/v2/metrics"
-    total = 0
-    early_stop = False
-    for page in paginate(endpoint, {}, batch_size):
-        # Stop early if we hit records at or before watermark (API returns newest first)
-        filtered = []
-        for m in page:
-            created_at = _parse_iso8601(m.get("created_at"))
-            if wm and created_at and created_at <= wm:
-                early_stop = True
-                continue
-            filtered.append(
-                {
-                    "id": m["id"],
-                    "partner_id": m.get("partner_id"),
-                    "created_at": m.get("created_at"),
-                    "updated_at": m.get("updated_at"),
-                    "key": m.get("key"),
-                    "value": m.get("value"),
-                    "source_id": m.get("source_id"),
-                    "source_version_id": m.get("source_version_id"),
-                    "pack_id": m.get("pack_id"),
-                    "pack_version_id": m.get("pack_version_id"),
-                    "scope": m.get("scope"),
-                }
-            )
-        if filtered:
-            upsert_metrics(engine, filtered)
-            total += len(filtered)
-            logger.info("Upserted %d metrics (cum=%d)", len(filtered), total)
+def record_cursor(item: dict) -> tuple[datetime, int]:
+    updated_at = _parse_iso8601(item.get("updated_at")) or _parse_iso8601(item.get("created_at"))
+    return updated_at or datetime.min.replace(tzinfo=timezone.utc), int(item["id"])
+
+
+def fetch_changes(
+    session: requests.Session,
+    endpoint: str,
+    cursor: tuple[datetime, int] | None,
+    batch_size: int,
+    window: int = 4,
+    params: dict | None = None,
+):
+    """Yield pages of records changed after `cursor` ((updated_at, id)); everything when it is None.
+
+    With QALITA_API_UPDATED_SINCE_PARAM set, the API filters on updated_at.
+    Otherwise pages come newest-created first and reading stops once records
+    were created more than EXPORT_LOOKBACK_DAYS before the cursor: records
+    older than that and updated since are only caught by --full-refresh.
+    """
+    params = dict(params or {})
+    stop_before = None
+    if cursor is not None:
+        since_param = get_env("QALITA_API_UPDATED_SINCE_PARAM")
+        if since_param:
+            params[since_param] = cursor[0].isoformat()
+        else:
+            stop_before = cursor[0] - timedelta(days=float(get_env("EXPORT_LOOKBACK_DAYS", "7")))
+    for page in paginate(session, endpoint, params, batch_size, window):
+        changed = []
+        early_stop = False
+        for item in page:
+            if stop_before is not None:
+                created_at = _parse_iso8601(item.get("created_at"))
+                if created_at and created_at < stop_before:
+                    early_stop = True
+                    continue
+            if cursor is None or record_cursor(item) > cursor:
+                changed.append(item)
+        if changed:
+            yield changed
         if early_stop:
             break
 
 
-def export_issues(engine: Engine, api_url: str, batch_size: int):
-    wm = get_watermark(engine, "qalita_issues")
-    endpoint = f"{api_url}/api/v2/issues"
+def parse_metric_value(value) -> tuple[str | None, float | None, str | None]:
+    """Split a metric value into (text, numeric, JSON) column values.
+
+    Numbers and numeric strings fill `value_numeric`; objects and arrays (or
+    strings holding one) fill `value_json`. The text form is always kept.
+    """
+    if value is None:
+        return None, None, None
+    if isinstance(value, (dict, list)):
+        encoded = json.dumps(value)
+        return encoded, None, encoded
+    if isinstance(value, bool):
+        return str(value).lower(), None, None
+    if isinstance(value, (int, float)):
+        numeric = float(value)
+        return str(value), numeric if math.isfinite(numeric) else None, None
+    text_value = str(value)
+    stripped = text_value.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            json.loads(stripped)
+        except ValueError:
+            return text_value, None, None
+        return text_value, None, stripped
+    try:
+        numeric = float(stripped)
+    except ValueError:
+        return text_value, None, None
+    return text_value, numeric if math.isfinite(numeric) else None, None
+
+
+def metric_row(item: dict) -> dict:
+    value, value_numeric, value_json = parse_metric_value(item.get("value"))
+    return {
+        "id": item["id"],
+        "partner_id": item.get("partner_id"),
+        "created_at": item.get("created_at"),
+        "updated_at": item.get("updated_at"),
+        "key": item.get("key"),
+        "value": value,
+        "value_numeric": value_numeric,
+        "value_json": value_json,
+        "source_id": item.get("source_id"),
+        "source_version_id": item.get("source_version_id"),
+        "pack_id": item.get("pack_id"),
+        "pack_version_id": item.get("pack_version_id"),
+        "scope": _to_json(item.get("scope")),
+    }
+
+
+def daily_rollup_key(row: dict) -> tuple[date, int] | None:
+    created_at = _parse_iso8601(row.get("created_at"))
+    if created_at is None:
+        return None
+    return created_at.date(), row.get("source_id")
+
+
+def refresh_daily_rollup(engine: Engine, touched: set[tuple[date, int]]):
+    """Recompute qalita_metrics_daily for the (day, source_id) pairs written in this run."""
+    if not touched or engine.dialect.name != "postgresql":
+        return
+    days, sources = zip(*sorted(touched))
+    params = {"days": list(days), "sources": list(sources), "lower": min(days), "upper": max(days) + timedelta(days=1)}
+    touched_pairs = "(select * from unnest(cast(:days as date[]), cast(:sources as bigint[])))"
+    with engine.begin() as conn:
+        conn.execute(text(f"delete from qalita_metrics_daily where (day, source_id) in {touched_pairs}"), params)
+        conn.execute(
+            text(
+                f"""
+                insert into qalita_metrics_daily (day, partner_id, source_id, pack_id, key, row_count, numeric_count,
+                                                  value_min, value_max, value_sum, value_avg, value_last, last_created_at)
+                select (created_at at time zone 'UTC')::date as day, partner_id, source_id, pack_id, key,
+                       count(*),
+                       count(value_numeric),
+                       min(value_numeric),
+                       max(value_numeric),
+                       sum(value_numeric),
+                       avg(value_numeric),
+                       (array_agg(value_numeric order by created_at desc, id desc)
+                            filter (where value_numeric is not null))[1],
+                       max(created_at)
+                from qalita_metrics
+                where created_at >= cast(:lower as date) at time zone 'UTC'
+                  and created_at < cast(:upper as date) at time zone 'UTC'
+                  and ((created_at at time zone 'UTC')::date, source_id) in {touched_pairs}
+                group by 1, 2, 3, 4, 5
+                """
+            ),
+            params,
+        )
+    logger.info("Refreshed qalita_metrics_daily for %d (day, source) pairs", len(touched))
+
+
+@dataclass(frozen=True)
+class EntitySpec:
+    """An API collection exported to a warehouse table keyed by `id`."""
+
+    name: str
+    path: str
+    table: str
+    columns: tuple[str, ...]
+    json_columns: frozenset[str] = frozenset({"scope"})
+    # API filter used to split the export across processes, and the collection listing its values
+    shard_by: str | None = None
+    shard_path: str | None = None
+    # Custom API item -> row mapping; by default columns are copied as-is
+    to_row: Callable[[dict], dict] | None = None
+    # Unique key used by upserts; must include the partition column of a partitioned table
+    conflict: tuple[str, ...] = ("id",)
+    # Column of the monthly range partitions created on demand (Postgres)
+    partition_by: str | None = None
+    # Rollups: key of the slice a written row belongs to, and the refresh run once for all touched slices
+    rollup_key: Callable[[dict], object] | None = None
+    refresh_rollup: Callable[[Engine, set], None] | None = None
+
+    def row(self, item: dict) -> dict:
+        if self.to_row is not None:
+            return self.to_row(item)
+        return {c: _to_json(item.get(c)) if c in self.json_columns else item.get(c) for c in self.columns}
+
+
+ENTITIES: dict[str, EntitySpec] = {}
+
+
+def register_entity(spec: EntitySpec) -> EntitySpec:
+    ENTITIES[spec.name] = spec
+    return spec
+
+
+register_entity(
+    EntitySpec(
+        name="metrics",
+        path="/api/v2/metrics",
+        table="qalita_metrics",
+        columns=(
+            "id", "partner_id", "created_at", "updated_at", "key", "value", "value_numeric", "value_json",
+            "source_id", "source_version_id", "pack_id", "pack_version_id", "scope",
+        ),
+        json_columns=frozenset({"scope", "value_json"}),
+        shard_by="source_id",
+        shard_path="/api/v2/sources",
+        to_row=metric_row,
+        conflict=("id", "created_at"),
+        partition_by="created_at",
+        rollup_key=daily_rollup_key,
+        refresh_rollup=refresh_daily_rollup,
+    )
+)
+
+register_entity(
+    EntitySpec(
+        name="issues",
+        path="/api/v2/issues",
+        table="qalita_issues",
+        columns=(
+            "id", "partner_id", "created_at", "updated_at", "title", "description", "status",
+            "url", "chat_url", "source_id", "assignee", "scope", "due_date",
+            "author_id", "closed_at", "updated_by", "closed_by",
+        ),
+    )
+)
+
+
+def export_entity(
+    engine: Engine,
+    session: requests.Session,
+    api_url: str,
+    spec: EntitySpec,
+    batch_size: int,
+    window: int = 4,
+    full_refresh: bool = False,
+    shard=None,
+) -> int:
+    """Export records of `spec` changed since its cursor; returns the number of rows written.
+
+    A shard exports only the records whose `spec.shard_by` equals `shard`,
+    under a cursor of its own.
+    """
+    state_key, where = spec.name, {}
+    if shard is not None:
+        state_key, where = f"{spec.name}:{spec.shard_by}={shard}", {spec.shard_by: shard}
+    cursor = None if full_refresh else load_cursor(engine, state_key, spec.table, where)
+    newest = cursor
     total = 0
-    early_stop = False
-    for page in paginate(endpoint, {}, batch_size):
-        filtered = []
-        for it in page:
-            created_at = _parse_iso8601(it.get("created_at"))
-            if wm and created_at and created_at <= wm:
-                early_stop = True
-                continue
-            filtered.append(
-                {
-                    "id": it["id"],
-                    "partner_id": it.get("partner_id"),
-                    "created_at": it.get("created_at"),
-                    "updated_at": it.get("updated_at"),
-                    "title": it.get("title"),
-                    "description": it.get("description"),
-                    "status": it.get("status"),
-                    "url": it.get("url"),
-                    "chat_url": it.get("chat_url"),
-                    "source_id": it.get("source_id"),
-                    "assignee": it.get("assignee"),
-                    "scope": it.get("scope"),
-                    "due_date": it.get("due_date"),
-                    "author_id": it.get("author_id"),
-                    "closed_at": it.get("closed_at"),
-                    "updated_by": it.get("updated_by"),
-                    "closed_by": it.get("closed_by"),
-                }
-            )
-        if filtered:
-            upsert_issues(engine, filtered)
-            total += len(filtered)
-            logger.info("Upserted %d issues (cum=%d)", len(filtered), total)
-        if early_stop:
-            break
+    touched = set()
+    for page in fetch_changes(session, f"{api_url}{spec.path}", cursor, batch_size, window, where):
+        rows = [spec.row(item) for item in page]
+        upsert_rows(engine, spec, rows)
+        total += len(rows)
+        logger.info("Upserted %d %s (cum=%d)", len(rows), state_key, total)
+        newest = max(filter(None, [newest, *map(record_cursor, page)]))
+        if spec.rollup_key is not None:
+            touched.update(key for key in map(spec.rollup_key, rows) if key is not None)
+    if spec.refresh_rollup is not None and touched:
+        spec.refresh_rollup(engine, touched)
+    # Saved only once every page is written and rolled up: an interrupted run is simply redone
+    if newest is not None and newest != cursor:
+        save_cursor(engine, state_key, newest)
+    return total
+
+
+def list_shards(session: requests.Session, api_url: str, spec: EntitySpec, batch_size: int, window: int = 4) -> list:
+    endpoint = f"{api_url}{spec.shard_path}"
+    return sorted({item["id"] for page in paginate(session, endpoint, {}, batch_size, window) for item in page})
+
+
+def _export_shard(name: str, shard, api_url: str, batch_size: int, window: int, full_refresh: bool) -> int:
+    # Runs in a worker process: engines and sessions cannot cross process boundaries
+    engine = make_engine(pool_size=1)
+    try:
+        with make_session(pool_size=window) as session:
+            return export_entity(engine, session, api_url, ENTITIES[name], batch_size, window, full_refresh, shard)
+    finally:
+        engine.dispose()
+
+
+def run_entity(
+    engine: Engine,
+    api_url: str,
+    spec: EntitySpec,
+    batch_size: int,
+    window: int,
+    full_refresh: bool,
+    shard_pool: ProcessPoolExecutor | None = None,
+) -> int:
+    with make_session(pool_size=window) as session:
+        if spec.shard_by and shard_pool is not None:
+            shards = list_shards(session, api_url, spec, batch_size, window)
+            logger.info("Exporting %s in %d %s shards", spec.name, len(shards), spec.shard_by)
+            futures = [
+                shard_pool.submit(_export_shard, spec.name, shard, api_url, batch_size, window, full_refresh)
+                for shard in shards
+            ]
+            return sum(future.result() for future in futures)
+        return export_entity(engine, session, api_url, spec, batch_size, window, full_refresh)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Export QALITA metrics and issues to the warehouse")
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="ignore the saved cursors and re-export every record",
+    )
+    parser.add_argument(
+        "--entity",
+        action="append",
+        choices=sorted(ENTITIES),
+        help="entity to export (repeatable; default: all)",
+    )
+    args = parser.parse_args()
     load_dotenv()
     api_url = get_env("QALITA_API_URL", required=True)
     batch_size = int(get_env("BATCH_SIZE", "1000"))
-    engine = make_engine()
-    export_metrics(engine, api_url, batch_size)
-    export_issues(engine, api_url, batch_size)
+    window = int(get_env("PREFETCH_PAGES", "4"))
+    processes = int(get_env("EXPORT_SHARD_PROCESSES", "0"))
+    specs = [ENTITIES[name] for name in (args.entity or ENTITIES)]
+
+    # One pooled connection per entity, exported side by side
+    engine = make_engine(pool_size=len(specs))
+    ensure_state_table(engine)
+    shard_pool = None
+    if processes > 0 and any(spec.shard_by for spec in specs):
+        # spawn: forking while fetch threads are running can deadlock the children
+        shard_pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+    failed = []
+    try:
+        with ThreadPoolExecutor(max_workers=len(specs), thread_name_prefix="qalita-export") as pool:
+            futures = {
+                pool.submit(run_entity, engine, api_url, spec, batch_size, window, args.full_refresh, shard_pool): spec
+                for spec in specs
+            }
+            for future in as_completed(futures):
+                spec = futures[future]
+                try:
+                    logger.info("Exported %d %s", future.result(), spec.name)
+                except Exception:
+                    logger.exception("Export of %s failed", spec.name)
+                    failed.append(spec.name)
+    finally:
+        if shard_pool is not None:
+            shard_pool.shutdown()
+        engine.dispose()
+    if failed:
+        raise SystemExit(f"Export failed for: {', '.join(sorted(failed))}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+-- Migrate qalita_metrics created by an earlier schema.sql (text values, primary key on id)
+-- to typed value columns, monthly partitions on created_at and the daily rollup.
+--
+-- Rewrites the table in one transaction: run it while the export job is stopped.
+-- Afterwards the job creates new monthly partitions by itself.
+
+begin;
+
+create function pg_temp.try_jsonb(value text) returns jsonb language plpgsql immutable as $$
+begin
+    if ltrim(value) ~ '^[\[{]' then
+        return value::jsonb;
+    end if;
+    return null;
+exception when others then
+    return null;
+end;
+$$;
+
+create function pg_temp.try_float(value text) returns double precision language plpgsql immutable as $$
+declare
+    parsed double precision;
+begin
+    parsed := trim(value)::double precision;
+    if parsed in ('NaN', 'Infinity', '-Infinity') then
+        return null;
+    end if;
+    return parsed;
+exception when others then
+    return null;
+end;
+$$;
+
+create table qalita_metrics_partitioned (
+    id bigint not null,
+    partner_id bigint not null,
+    created_at timestamptz not null,
+    updated_at timestamptz not null,
+    key text not null,
+    value text,
+    value_numeric double precision,
+    value_json jsonb,
+    source_id bigint not null,
+    source_version_id bigint not null,
+    pack_id bigint not null,
+    pack_version_id bigint not null,
+    scope jsonb,
+    primary key (id, created_at)
+) partition by range (created_at);
+
+do $$
+declare
+    month timestamp;
+begin
+    for month in
+        select distinct date_trunc('month', created_at at time zone 'UTC') from qalita_metrics
+    loop
+        execute format(
+            'create table %I partition of qalita_metrics_partitioned for values from (%L) to (%L)',
+            'qalita_metrics_' || to_char(month, 'YYYY_MM'),
+            month at time zone 'UTC',
+            (month + interval '1 month') at time zone 'UTC'
+        );
+    end loop;
+end;
+$$;
+
+insert into qalita_metrics_partitioned (id, partner_id, created_at, updated_at, key, value, value_numeric, value_json,
+                                        source_id, source_version_id, pack_id, pack_version_id, scope)
+select id, partner_id, created_at, updated_at, key, value, pg_temp.try_float(value), pg_temp.try_jsonb(value),
+       source_id, source_version_id, pack_id, pack_version_id, scope
+from qalita_metrics;
+
+drop table qalita_metrics;
+alter table qalita_metrics_partitioned rename to qalita_metrics;
+alter table qalita_metrics rename constraint qalita_metrics_partitioned_pkey to qalita_metrics_pkey;
+
+create index ix_qalita_metrics_created_at on qalita_metrics (created_at desc);
+create index ix_qalita_metrics_source on qalita_metrics (source_id);
+create index ix_qalita_metrics_pack on qalita_metrics (pack_id);
+create index ix_qalita_metrics_key on qalita_metrics (key);
+create index ix_qalita_metrics_scope_perimeter on qalita_metrics ((scope->>'perimeter'));
+
+create table if not exists qalita_metrics_daily (
+    day date not null,
+    partner_id bigint not null,
+    source_id bigint not null,
+    pack_id bigint not null,
+    key text not null,
+    row_count bigint not null,
+    numeric_count bigint not null,
+    value_min double precision,
+    value_max double precision,
+    value_sum double precision,
+    value_avg double precision,
+    value_last double precision,
+    last_created_at timestamptz not null,
+    primary key (day, partner_id, source_id, pack_id, key)
+);
+
+create index if not exists ix_qalita_metrics_daily_source on qalita_metrics_daily (source_id, day);
+create index if not exists ix_qalita_metrics_daily_key on qalita_metrics_daily (key, day);
+
+-- Backfill the rollup from the migrated history
+insert into qalita_metrics_daily (day, partner_id, source_id, pack_id, key, row_count, numeric_count,
+                                  value_min, value_max, value_sum, value_avg, value_last, last_created_at)
+select (created_at at time zone 'UTC')::date, partner_id, source_id, pack_id, key,
+       count(*),
+       count(value_numeric),
+       min(value_numeric),
+       max(value_numeric),
+       sum(value_numeric),
+       avg(value_numeric),
+       (array_agg(value_numeric order by created_at desc, id desc) filter (where value_numeric is not null))[1],
+       max(created_at)
+from qalita_metrics
+group by 1, 2, 3, 4, 5
+on conflict do nothing;
+
+commit;
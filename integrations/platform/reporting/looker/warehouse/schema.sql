@@ -1,19 +1,26 @@
 -- QALITA → Warehouse schema (Postgres compatible)
--- Tables: qalita_metrics, qalita_issues
+-- Tables: qalita_metrics, qalita_metrics_daily, qalita_issues, qalita_export_state
+-- Existing warehouses created before typed metrics: run migrations/001_typed_partitioned_metrics.sql
 
+-- Partitioned by month on created_at; the export job creates the monthly
+-- partitions (qalita_metrics_YYYY_MM) before writing rows into them.
 create table if not exists qalita_metrics (
-    id bigint primary key,
+    id bigint not null,
     partner_id bigint not null,
     created_at timestamptz not null,
     updated_at timestamptz not null,
     key text not null,
     value text,
+    -- Parsed by the export job: numeric values, and JSON object/array values
+    value_numeric double precision,
+    value_json jsonb,
     source_id bigint not null,
     source_version_id bigint not null,
     pack_id bigint not null,
     pack_version_id bigint not null,
-    scope jsonb
-);
+    scope jsonb,
+    primary key (id, created_at)
+) partition by range (created_at);
 
 create index if not exists ix_qalita_metrics_created_at on qalita_metrics (created_at desc);
 create index if not exists ix_qalita_metrics_source on qalita_metrics (source_id);
@@ -23,6 +30,28 @@ create index if not exists ix_qalita_metrics_scope_perimeter on qalita_metrics (
 
 -- Composite uniqueness for latest-only semantics can be implemented with materialized views if needed.
 
+-- Daily rollup of numeric metric values, refreshed by the export job for the
+-- (day, source) pairs it wrote. Days are UTC.
+create table if not exists qalita_metrics_daily (
+    day date not null,
+    partner_id bigint not null,
+    source_id bigint not null,
+    pack_id bigint not null,
+    key text not null,
+    row_count bigint not null,
+    numeric_count bigint not null,
+    value_min double precision,
+    value_max double precision,
+    value_sum double precision,
+    value_avg double precision,
+    value_last double precision,
+    last_created_at timestamptz not null,
+    primary key (day, partner_id, source_id, pack_id, key)
+);
+
+create index if not exists ix_qalita_metrics_daily_source on qalita_metrics_daily (source_id, day);
+create index if not exists ix_qalita_metrics_daily_key on qalita_metrics_daily (key, day);
+
 create table if not exists qalita_issues (
     id bigint primary key,
     partner_id bigint not null,
@@ -48,3 +77,11 @@ create index if not exists ix_qalita_issues_status on qalita_issues (status);
 create index if not exists ix_qalita_issues_source on qalita_issues (source_id);
 create index if not exists ix_qalita_issues_assignee on qalita_issues (assignee);
 create index if not exists ix_qalita_issues_scope_perimeter on qalita_issues ((scope->>'perimeter'));
+
+-- Export job state: per-entity cursor on (updated_at, id) for incremental syncs
+create table if not exists qalita_export_state (
+    entity text primary key,
+    cursor_updated_at timestamptz,
+    cursor_id bigint,
+    synced_at timestamptz not null
+);